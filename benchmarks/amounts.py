@@ -0,0 +1,47 @@
+"""
+Benchmark re-extracting amounts from stored descriptions.
+
+    python -m benchmarks.amounts
+
+Extracts the amounts of the dataset used by benchmarks.frame once per
+distinct description, against parsing each description with Interest. Both
+use amounts.parse_amount, so give the same amounts.
+"""
+import timeit
+from collections import namedtuple
+
+import numpy as np
+
+from mp_financial_interests.amounts import extract_amounts
+from mp_financial_interests.interest import Interest
+from mp_financial_interests.lib.formatters import pounds_to_pence
+
+from benchmarks.frame import load_full_dataset
+
+
+Line = namedtuple('Line', ['text'])
+
+
+def extract_amounts_per_interest(descriptions):
+    amounts = []
+    for description in descriptions:
+        interest = Interest(None)
+        interest.add_line(Line(description))
+        amount = interest._parse_maximum_amount_from_lines()
+        amounts.append(pounds_to_pence(amount) if amount else 0)
+    return np.array(amounts)
+
+
+def main():
+    descriptions = load_full_dataset()['description'].astype(str)
+    print('{} interests'.format(len(descriptions)))
+
+    distinct = extract_amounts(descriptions).fillna(0).to_numpy(dtype=np.int64)
+    assert (distinct == extract_amounts_per_interest(descriptions)).all()
+    for name, extract in [('per interest', extract_amounts_per_interest), ('distinct', extract_amounts)]:
+        extract_time = min(timeit.repeat(lambda: extract(descriptions), number=1, repeat=3))
+        print('{} {:.0f}ms'.format(name, extract_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Benchmark the diff of two registers.
+
+    python -m benchmarks.diff
+
+Diffs the dataset used by benchmarks.frame against a copy with 1% of the
+interests removed, 1% with edited amounts and 1% with edited descriptions.
+Fingerprinting and each hash join are linear, so the diff of the full
+register takes around a second - mostly normalising the descriptions.
+"""
+import timeit
+
+import numpy as np
+
+from mp_financial_interests.fingerprints import diff_interests
+
+from benchmarks.frame import load_full_dataset
+
+
+def main():
+    old = load_full_dataset()
+    rng = np.random.default_rng(0)
+    positions = rng.permutation(len(old))
+    edited_amounts, edited_descriptions, removed = np.array_split(positions[:len(old) * 3 // 100], 3)
+    new = old.copy()
+    new.iloc[edited_amounts, new.columns.get_loc('amount')] += 100
+    new.iloc[edited_descriptions, new.columns.get_loc('description')] += ' (updated)'
+    new = new.drop(index=new.index[removed])
+    print('{} interests'.format(len(old)))
+
+    diff = diff_interests(old, new)
+    print(diff['change'].value_counts().to_string())
+    diff_time = min(timeit.repeat(lambda: diff_interests(old, new), number=1, repeat=3))
+    print('diff {:.0f}ms'.format(diff_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark errata lookup against a synthetic 10k erratum table.
+
+    python -m benchmarks.errata
+
+Compares the indexed Errata.get_erratum with the previous linear scan, which
+subset tested every erratum registered for the error code.
+"""
+import random
+import timeit
+
+from mp_financial_interests.errata import Errata
+from mp_financial_interests.erratum import InterestTypeErratum, ParentLineErratum, AmountErratum
+
+from benchmarks.synthetic import SESSIONS, synthetic_member_name
+
+
+NUMBER_OF_ERRATA = 10000
+NUMBER_OF_LOOKUPS = 1000
+
+
+def synthetic_errata(n, seed=0):
+    rand = random.Random(seed)
+    errata = []
+    for i in range(n):
+        erratum_class = rand.choice([InterestTypeErratum, ParentLineErratum, AmountErratum])
+        kwargs = {'member_name': synthetic_member_name(i)}
+        if rand.random() < 0.7:
+            kwargs['session'] = rand.choice(SESSIONS)
+        if rand.random() < 0.1:
+            kwargs['type_code'] = rand.randint(1, 10)
+        if rand.random() < 0.8:
+            kwargs['line'] = 'Synthetic register line {}.'.format(i)
+        errata.append(erratum_class(**kwargs))
+    return errata
+
+
+def synthetic_filters(errata, n, seed=0):
+    rand = random.Random(seed)
+    filters = []
+    for _ in range(n):
+        erratum = rand.choice(errata)
+        f = {
+            'member_name': 'nomatch, test',
+            'session': rand.choice(SESSIONS),
+            'type_code': rand.randint(1, 10),
+            'line': 'Unmatched line.'
+        }
+        # Half the lookups hit an erratum, half miss
+        if rand.random() < 0.5:
+            f.update(dict(erratum.filter_on))
+        filters.append((erratum.error_code, f))
+    return filters
+
+
+def linear_get_erratum(errata_by_code, error_code, filters):
+    filters_set = set(tuple(filters.items()))
+    for err in errata_by_code.get(error_code, []):
+        if err.filter_on.issubset(filters_set):
+            return err
+
+
+def main():
+    errata_list = synthetic_errata(NUMBER_OF_ERRATA)
+    errata = Errata(errata_list)
+    errata_by_code = {}
+    for erratum in errata_list:
+        errata_by_code.setdefault(erratum.error_code, []).append(erratum)
+
+    filters = synthetic_filters(errata_list, NUMBER_OF_LOOKUPS)
+
+    for error_code, f in filters:
+        assert errata.get_erratum(error_code, f) is linear_get_erratum(errata_by_code, error_code, f)
+
+    indexed = min(timeit.repeat(
+        lambda: [errata.get_erratum(c, f) for c, f in filters], number=1, repeat=5))
+    linear = min(timeit.repeat(
+        lambda: [linear_get_erratum(errata_by_code, c, f) for c, f in filters], number=1, repeat=5))
+
+    print('{} errata, {} lookups'.format(NUMBER_OF_ERRATA, NUMBER_OF_LOOKUPS))
+    print('Linear scan: {:.2f}ms ({:.1f}us per lookup)'.format(linear * 1000, linear / NUMBER_OF_LOOKUPS * 1e6))
+    print('Indexed:     {:.2f}ms ({:.1f}us per lookup)'.format(indexed * 1000, indexed / NUMBER_OF_LOOKUPS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark memory use and aggregation speed of the interests frame.
+
+    python -m benchmarks.frame
+
+Uses the full 2010-2018 dataset if it has been cached (by running the CLI
+without --session or --member-name), otherwise a synthetic dataset of the
+same scale. Compares the previous all-object frame with float amounts to
+the compact frame - categorical columns, small-int type codes and int64
+pence amounts - and to the member, session and type rollups the store
+maintains.
+"""
+import timeit
+
+import pandas as pd
+
+from mp_financial_interests.interests import Interests
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.store import InterestsStore, get_rollups
+from mp_financial_interests.exports import pence_to_pounds
+from mp_financial_interests.lib.helpers import decimalize
+
+from benchmarks.synthetic import synthetic_interests
+
+
+# Roughly the number of interests in the 2010-2018 registers
+NUMBER_OF_INTERESTS = 80000
+
+
+def load_full_dataset():
+    store = InterestsStore()
+    if store.sessions:
+        return store.read()
+    else:
+        builder = InterestsBuilder(Interests.columns)
+        for member_name, interest in synthetic_interests(NUMBER_OF_INTERESTS):
+            builder.add_interest(member_name, interest)
+        return builder.dataframe
+
+
+def to_object_frame(dataframe):
+    # The frame as it was built by per-row appends - object columns, with
+    # float amounts in pounds and None for missing amounts
+    amounts = [a / 100 if a else None for a in dataframe['amount']]
+    return dataframe.astype(object).assign(amount=pd.Series(amounts, dtype=object))
+
+
+def aggregations(dataframe, total):
+    return {
+        'total': lambda: total(dataframe['amount']),
+        'by member': lambda: dataframe.groupby(['member_name'], observed=True)['amount'].sum(),
+        'by member, session': lambda: dataframe.groupby(['member_name', 'session'], observed=True)['amount'].sum(),
+        'by session, type': lambda: dataframe.groupby(['session', 'type_code'], observed=True)['amount'].sum(),
+    }
+
+
+def main():
+    compact = load_full_dataset()
+    objects = to_object_frame(compact)
+    rollups = get_rollups(compact)
+
+    print('{} interests'.format(len(compact)))
+    print('{:<22} {:>12} {:>12} {:>12}'.format('', 'object', 'compact', 'rollups'))
+    print('{:<22} {:>10.1f}MB {:>10.1f}MB {:>10.1f}MB'.format(
+        'memory',
+        objects.memory_usage(deep=True).sum() / 1e6,
+        compact.memory_usage(deep=True).sum() / 1e6,
+        rollups.memory_usage(deep=True).sum() / 1e6
+    ))
+
+    object_aggregations = aggregations(objects, lambda a: decimalize(a.sum()))
+    compact_aggregations = aggregations(compact, lambda a: pence_to_pounds(a.sum()))
+    rollup_aggregations = aggregations(rollups, lambda a: pence_to_pounds(a.sum()))
+    assert object_aggregations['total']() == compact_aggregations['total']() == rollup_aggregations['total']()
+
+    for name in object_aggregations:
+        times = [
+            min(timeit.repeat(a[name], number=1, repeat=5))
+            for a in [object_aggregations, compact_aggregations, rollup_aggregations]
+        ]
+        print('{:<22} {:>10.2f}ms {:>10.2f}ms {:>10.2f}ms'.format(name, *[t * 1000 for t in times]))
+
+
+if __name__ == '__main__':
+    main()
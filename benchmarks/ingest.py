@@ -0,0 +1,66 @@
+"""
+Benchmark how ingest time scales with the number of interests.
+
+    python -m benchmarks.ingest
+
+Compares the previous per-row DataFrame.loc append with InterestsBuilder,
+materialising a batch per member page (as Interests does).
+"""
+import time
+
+import pandas as pd
+
+from mp_financial_interests.interests import Interests
+from mp_financial_interests.interests_builder import InterestsBuilder
+
+from benchmarks.synthetic import synthetic_interests
+
+
+COUNTS = [500, 1000, 2000, 4000, 16000, 64000]
+
+# Roughly the number of interests on a member page
+BATCH_SIZE = 15
+
+# The per-row append is quadratic, so isn't run for the largest counts
+MAX_LOC_APPEND_COUNT = 4000
+
+
+def loc_append(interests):
+    dataframe = pd.DataFrame(columns=Interests.columns)
+    for member_name, interest in interests:
+        row = [member_name]
+        row += [getattr(interest, c, None) for c in Interests.columns if c != 'member_name']
+        dataframe.loc[len(dataframe)] = row
+    return dataframe
+
+
+def builder(interests):
+    interests_builder = InterestsBuilder(Interests.columns)
+    for i, (member_name, interest) in enumerate(interests):
+        interests_builder.add_interest(member_name, interest)
+        if not i % BATCH_SIZE:
+            interests_builder.flush()
+    return interests_builder.dataframe
+
+
+def timed(func, interests):
+    start = time.perf_counter()
+    dataframe = func(interests)
+    assert len(dataframe) == len(interests)
+    return time.perf_counter() - start
+
+
+def main():
+    print('{:>10} {:>14} {:>14}'.format('interests', 'loc append', 'builder'))
+    for count in COUNTS:
+        interests = list(synthetic_interests(count))
+        builder_time = timed(builder, interests)
+        if count <= MAX_LOC_APPEND_COUNT:
+            loc_time = '{:.3f}s'.format(timed(loc_append, interests))
+        else:
+            loc_time = '-'
+        print('{:>10} {:>14} {:>13.3f}s'.format(count, loc_time, builder_time))
+
+
+if __name__ == '__main__':
+    main()
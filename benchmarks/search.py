@@ -0,0 +1,44 @@
+"""
+Benchmark --filter lookups with the description index.
+
+    python -m benchmarks.search
+
+Compares the previous regex scan of every description with the inverted
+index, for single words, phrases and a true regex (which falls back to a
+scan). Uses the same dataset as benchmarks.frame.
+"""
+import re
+import timeit
+
+import numpy as np
+
+from mp_financial_interests.search import DescriptionIndex
+
+from benchmarks.frame import load_full_dataset
+
+
+TERMS = ['cornwall', 'shares', 'hare', 'flights to london', '£1,2', 'speech|article']
+
+
+def main():
+    descriptions = load_full_dataset()['description']
+    print('{} interests'.format(len(descriptions)))
+
+    build_time = min(timeit.repeat(lambda: DescriptionIndex.build(descriptions), number=1, repeat=3))
+    fingerprint_time = min(timeit.repeat(lambda: DescriptionIndex.get_fingerprint(descriptions), number=1, repeat=3))
+    print('build {:.0f}ms, fingerprint {:.0f}ms'.format(build_time * 1000, fingerprint_time * 1000))
+    index = DescriptionIndex.build(descriptions)
+
+    print('{:<20} {:>8} {:>12} {:>12}'.format('', 'matches', 'scan', 'index'))
+    for term in TERMS:
+        scan = lambda: descriptions.str.contains(term, flags=re.IGNORECASE).to_numpy(dtype=bool)
+        lookup = lambda: index.search(descriptions, term)
+        assert np.array_equal(scan(), lookup())
+        scan_time = min(timeit.repeat(scan, number=1, repeat=5))
+        index_time = min(timeit.repeat(lookup, number=1, repeat=5))
+        print('{:<20} {:>8} {:>10.1f}ms {:>10.1f}ms'.format(
+            term, lookup().sum(), scan_time * 1000, index_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
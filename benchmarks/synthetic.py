@@ -0,0 +1,54 @@
+"""
+Synthetic interests, shaped like the parsed register, for benchmarks.
+"""
+import random
+from collections import namedtuple
+
+from mp_financial_interests.interest_types import get_interest_type
+
+
+SESSIONS = ['2010-12', '2012-13', '2013-14', '2014-15', '2015-16', '2016-17', '2017-19']
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+WORDS = ['payment', 'received', 'from', 'for', 'speech', 'article', 'hours', 'address',
+         'london', 'limited', 'consultancy', 'services', 'donation', 'hospitality',
+         'tickets', 'visit', 'flights', 'accommodation', 'cornwall', 'director', 'shares']
+
+# Stands in for Interest - has the attributes Interests reads
+SyntheticInterest = namedtuple('SyntheticInterest', [
+    'title', 'type_code', 'amount', 'date', 'description', 'session'
+])
+
+
+def synthetic_member_name(i):
+    # Member names are letters only, so spell out the number
+    surname = ''
+    while True:
+        i, r = divmod(i, 26)
+        surname += chr(ord('a') + r)
+        if not i:
+            return '{}, test'.format(surname)
+
+
+def synthetic_interests(n, number_of_members=650, seed=0):
+    """Yield (member_name, interest) pairs"""
+    rand = random.Random(seed)
+    for i in range(n):
+        session = rand.choice(SESSIONS)
+        type_code = rand.randint(1, 10)
+        amount = round(rand.uniform(0, 20000), 2) if rand.random() < 0.7 else None
+        date = '{} {} {}'.format(rand.randint(1, 28), rand.choice(MONTHS), rand.randint(2010, 2018))
+        description = ' '.join(rand.choice(WORDS) for _ in range(rand.randint(8, 30)))
+        if amount:
+            description += ' £{:,.2f}'.format(amount)
+        description += ' (Registered {})'.format(date)
+        yield synthetic_member_name(rand.randrange(number_of_members)), SyntheticInterest(
+            title=get_interest_type(session, type_code).title,
+            type_code=type_code,
+            amount=amount,
+            date=date,
+            description=description,
+            session=session
+        )
@@ -0,0 +1,127 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+import pandas as pd
+
+from mp_financial_interests.lib.helpers import remove_remuneration_bands
+from mp_financial_interests.lib.formatters import pounds_to_pence
+
+
+# Amount extraction - fingerprinted apart from the rest of the parser (see
+# cache.get_amount_fingerprint), so a change here can be applied to stored
+# interests by re-extracting their amounts rather than parsing them again
+
+# Regex for extracting money value from a string - eg: £1,000. Without a
+# leading .*?, which made findall quadratic in the length of the lines
+re_amount = re.compile(r"£\s*([0-9,\.\-]+)")
+
+
+def currency_to_float(currency):
+    """
+    Convert currency string to int
+    @param str: currency to convert
+    @return: int
+    """
+
+    currency = currency.strip()
+
+    # If that last char is a full stop, remove it
+    currency = currency.rstrip('.')
+
+    # If the last char is a - remove it
+    currency = currency.rstrip('-')
+
+    # Common problem is adding extra decimal points, instead of thousands comma separator
+    # SO if we have more than one decimal point, remove it
+    if currency.count('.') > 1:
+        currency = currency.replace('.', '', currency.count('.') - 1)
+
+    # Some currency values have a range: e.g.: Spencer, Mark 20-14-15: £5-10,000
+    # We want to make sure these aren't recorded as £5, so - is included in the regex
+    # But we want to split on it and take the upper bounds
+    if '-' in currency:
+        currency = currency.split('-')[1]
+
+    value = re.sub(r'[^\d.]', '', currency.replace(',', '').rstrip('.'))
+
+    try:
+        value = Decimal(value)
+    except AttributeError:
+        print('Could not parse amount: %s' % currency)
+        raise
+
+    return float(value)
+
+
+def _find_amounts(text):
+    # Some interests include the renumeration band the interest falls into e.g. (£45,001-£50,000)
+    # So try extracting the amount without the bounds, and if that doesn't work, with the bands
+    for lines in [remove_remuneration_bands(text), text]:
+        amount = re_amount.findall(lines)
+        if amount:
+            return amount
+
+
+def parse_amount(text):
+    """
+    The highest amount in an interest's lines, in pounds - or None if there
+    isn't one, or any can't be parsed
+    """
+    amount = _find_amounts(text)
+    if not amount:
+        return None
+    try:
+        # Always get the highest value - hopefully this will be the total
+        return max(list(map(currency_to_float, amount)))
+    except (ValueError, InvalidOperation):
+        # e.g. a stray £- with no digits
+        pass
+    return None
+
+
+def extract_amounts(descriptions):
+    """
+    The amount of each of a Series of interests' lines, in pence, as
+    parse_amount extracts it - NA if there isn't one. Descriptions repeat
+    across sessions, so each distinct description is only parsed once
+    """
+    codes, uniques = pd.factorize(descriptions.fillna('').astype(str))
+    amounts = [parse_amount(d) for d in uniques]
+    pence = pd.array([pounds_to_pence(a) if a else None for a in amounts] + [None], dtype='Int64')
+    # Code -1 (no description) takes the trailing NA
+    return pd.Series(pence[codes], index=descriptions.index)
+
+
+def strip_parents(descriptions, parent_lengths):
+    """
+    Descriptions without the parent line each starts with - the interest's
+    own lines, which Interest extracts amounts from
+    """
+    descriptions = descriptions.fillna('').astype(str).reset_index(drop=True)
+    parent_lengths = parent_lengths.to_numpy()
+    # Few interests have a parent, so they're sliced one by one
+    children = np.flatnonzero(parent_lengths)
+    descriptions.iloc[children] = [
+        d[n:] for d, n in zip(descriptions.iloc[children], parent_lengths[children])
+    ]
+    return descriptions
+
+
+def get_overridden_mask(dataframe, errata):
+    """
+    Mask of the interests whose amount was replaced by an amount erratum -
+    these amounts can't be extracted from the description
+    """
+    mask = pd.Series(False, index=dataframe.index)
+    for erratum in errata:
+        if not erratum.replacement_amount:
+            continue
+        matches = pd.Series(True, index=dataframe.index)
+        for field, value in erratum.filter_on:
+            if field == 'line':
+                matches &= dataframe['description'].astype(str).str.contains(value, regex=False)
+            else:
+                matches &= dataframe[field].astype(object) == value
+        mask |= matches
+    return mask
@@ -0,0 +1,138 @@
+import os
+import glob
+import hashlib
+import logging
+from functools import lru_cache
+
+from mp_financial_interests.errata import errata
+from mp_financial_interests.lib.files import atomic_path
+
+
+logger = logging.getLogger()
+
+
+CACHE_DIR = '/tmp/mp_cache'
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose code determines the parsed interests - any change to these
+# invalidates cached parse results. errata.py only holds the errata, which
+# are covered by the errata fingerprint - so adding an erratum only
+# invalidates the pages it applies to
+PARSER_MODULES = [
+    'erratum.py',
+    'interest.py',
+    'interest_type.py',
+    'interest_types.py',
+    'interests_builder.py',
+    'lib/formatters.py',
+    'lib/helpers.py',
+    'register/element.py',
+    'register/index.py',
+    'register/line.py',
+    'register/member.py',
+    'register/members.py',
+    'register/session.py',
+]
+
+# Modules whose code extracts amounts from the parsed interests - a change
+# to these can be applied to stored interests by re-extracting their amounts
+AMOUNT_MODULES = [
+    'amounts.py',
+]
+
+# Modules whose code determines the fetched register pages
+FETCH_MODULES = [
+    'register/page.py',
+]
+
+
+def _get_modules_fingerprint(modules, sha1):
+    for module in modules:
+        with open(os.path.join(PACKAGE_DIR, module), 'rb') as f:
+            sha1.update(f.read())
+    return sha1
+
+
+@lru_cache(maxsize=None)
+def get_parser_fingerprint():
+    # Fingerprint of the parser code, including the interest types
+    return _get_modules_fingerprint(PARSER_MODULES, hashlib.sha1()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_amount_fingerprint():
+    return _get_modules_fingerprint(AMOUNT_MODULES, hashlib.sha1()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_fetch_fingerprint():
+    return _get_modules_fingerprint(FETCH_MODULES, hashlib.sha1()).hexdigest()
+
+
+def get_errata_fingerprint():
+    return errata.fingerprint
+
+
+def get_member_errata_fingerprint(member_name, session):
+    return errata.get_member_fingerprint(member_name, session)
+
+
+class PageCache:
+
+    """
+    Cache of fetched register pages, stored as files within a directory per
+    fetch fingerprint. Pages fetched with different code are never served,
+    and are replaced as each page is fetched again.
+
+    Pages are written to a temporary file and renamed into place, so several
+    processes can share the cache without seeing partially written pages.
+    """
+
+    def __init__(self, cache_dir=os.path.join(CACHE_DIR, 'pages')):
+        self.cache_dir = cache_dir
+
+    @property
+    def fingerprint(self):
+        return get_fetch_fingerprint()
+
+    @staticmethod
+    def _get_file_name(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html'
+
+    def _get_path(self, url, fingerprint=None):
+        return os.path.join(self.cache_dir, fingerprint or self.fingerprint, self._get_file_name(url))
+
+    def __getitem__(self, url):
+        try:
+            with open(self._get_path(url), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(url)
+
+    def __setitem__(self, url, content):
+        with atomic_path(self._get_path(url)) as path:
+            with open(path, 'wb') as f:
+                f.write(content)
+        # Remove any stale copies of the page
+        for stale_path in self._get_stale_paths(self._get_file_name(url)):
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                # Already removed by another process
+                pass
+            try:
+                os.rmdir(os.path.dirname(stale_path))
+            except OSError:
+                # Directory still has other stale pages
+                pass
+
+    def _get_stale_paths(self, file_name='*.html'):
+        for path in glob.glob(os.path.join(self.cache_dir, '*', file_name)):
+            if os.path.basename(os.path.dirname(path)) != self.fingerprint:
+                yield path
+
+    def status(self):
+        total = len(glob.glob(os.path.join(self.cache_dir, '*', '*.html')))
+        stale = len(list(self._get_stale_paths()))
+        return total - stale, stale
@@ -1,48 +1,221 @@
 import click
 import click_log
 import logging
+from pandas.errors import DatabaseError
 
 
-from mp_financial_interests.register.index import RegisterIndexPage
+from mp_financial_interests.register.page import page_cache
 from mp_financial_interests.interests import Interests
+from mp_financial_interests.store import InterestsStore
+from mp_financial_interests.sqlite_store import SQLiteStore
+from mp_financial_interests.exports import extensions, write_dataframe
 
 
 logger = logging.getLogger()
 click_log.basic_config(logger)
 
+stores = {
+    'parquet': InterestsStore,
+    'sqlite': SQLiteStore,
+}
 
-index = RegisterIndexPage()
+frequencies = {
+    'month': 'M',
+    'quarter': 'Q',
+}
 
 
-@click.command()
-@click.option('--session', '-s', default=None, type=click.Choice(index.keys()), help="Import specfic annual period.")
+class OutputType(click.ParamType):
+
+    """
+    An output format, optionally with the path to write it to - e.g. csv, or
+    jsonl:/data/mps.jsonl.gz to gzip it
+    """
+
+    name = 'output'
+    formats = ['console'] + sorted(extensions)
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, tuple):
+            return value
+        output_format, _, path = value.partition(':')
+        if output_format not in self.formats:
+            self.fail('{} is not one of {}.'.format(output_format, ', '.join(self.formats)), param, ctx)
+        if output_format == 'console' and path:
+            self.fail('console output has no path.', param, ctx)
+        if output_format == 'feather' and path.endswith('.gz'):
+            self.fail("feather output can't be gzipped, as it's memory mapped.", param, ctx)
+        return output_format, path or None
+
+
+output_help = (
+    "Output to console, csv, jsonl (JSON Lines) or feather (Arrow IPC) - as format or format:path, "
+    "by default in /tmp, gzipped if the path ends in .gz. Repeat for several outputs, all written "
+    "from one pass over the interests. Ungrouped, unordered CSV and JSON Lines are streamed as pages "
+    "are ingested. Feather keeps amounts in pence, uncompressed so it can be memory mapped, and "
+    "Interests.from_feather queries it without the register."
+)
+
+
+def get_targets(outputs, file_name):
+    # The files to write - by default file_name with the output's extension
+    return [
+        (output_format, path or '{}.{}'.format(file_name, extensions[output_format]))
+        for output_format, path in outputs if output_format != 'console'
+    ]
+
+
+def is_console(outputs):
+    return any(output_format == 'console' for output_format, _ in outputs)
+
+
+@click.group(invoke_without_command=True)
+@click.option('--session', '-s', default=None, type=click.Choice(Interests.get_sessions()), help="Import specfic annual period.")
 @click.option('--member-name', '-mp', default=None, help='Import specific member.')
 @click.option('--filter', '-f', default=None, help='Filter interests by term.')
-@click.option('--output', '-o', default=None, type=click.Choice(['csv', 'console']), help="Output to console or CSV.")
-@click.option('--group_by', '-g', default=None, type=click.Choice(['mp', 'session']), help="Group interests by member, session or both.", multiple=True)
+@click.option('--from', 'date_from', default=None, type=click.DateTime(formats=['%Y-%m-%d']), help="Only interests registered on or after date (YYYY-MM-DD).")
+@click.option('--to', 'date_to', default=None, type=click.DateTime(formats=['%Y-%m-%d']), help="Only interests registered on or before date (YYYY-MM-DD).")
+@click.option('--output', '-o', type=OutputType(), multiple=True, help=output_help)
+@click.option('--group_by', '-g', default=None, type=click.Choice(['mp', 'session', 'type']), help="Group interests by member, session, type or a combination.", multiple=True)
+@click.option('--dedupe', is_flag=True, help="Remove interests repeating an earlier declaration.")
 @click.option('--order', default=None, type=click.Choice(Interests.columns), help="Order interests by field.")
+@click.option('--summary', default=None, type=click.Choice(['type', 'member']), help="Summarise amounts per type and session, or per type, session and member.")
+@click.option('--resample', default=None, type=click.Choice(sorted(frequencies)), help="Total amounts per month or quarter, split by any grouping.")
+@click.option('--store', default='parquet', type=click.Choice(sorted(stores)), help="Store interests as Parquet files or in a SQLite database.")
+@click.option('--limit', '-n', default=None, type=click.IntRange(min=0), help="Only output the first N interests - the N largest when ordered.")
 @click.option('--clear_cache', '-cc', is_flag=True)
 @click_log.simple_verbosity_option(logger)
-def main(session, member_name, filter, output, clear_cache, group_by, order):
-    interests = Interests(session, member_name, clear_cache)
+@click.pass_context
+def main(ctx, session, member_name, filter, date_from, date_to, dedupe, output, summary, resample, store, limit, clear_cache, group_by, order):
+    if ctx.invoked_subcommand:
+        return
+
+    # The register is ingested when first queried - or as it's streamed
+    interests = Interests(session, member_name, clear_cache, store=stores[store](), ingest=False)
 
     if 'mp' in group_by:
         interests.group_by_member()
     if 'session' in group_by:
         interests.group_by_session()
+    if 'type' in group_by:
+        interests.group_by_type()
 
     if filter:
         interests.set_filter(filter)
 
+    if date_from or date_to:
+        interests.set_date_range(date_from, date_to)
+
+    if dedupe:
+        interests.set_dedupe()
+        repeats = interests.repeats
+        message = 'Removed {} repeated interests totalling £{:0,.2f}'.format(len(repeats), repeats['amount'].sum())
+        if is_console(output):
+            print(message)
+        else:
+            logger.info(message)
+
     if order:
         interests.set_order_by(order)
 
-    if output == 'csv':
-        interests.to_csv('/tmp/mps.csv')
-    elif output == 'console':
-        print(interests.to_table())
-        if interests.total:
-            print('TOTAL: £{:0,.2f}'.format(interests.total))
+    if limit is not None:
+        interests.set_limit(limit)
+
+    if summary:
+        output_report(interests.summary(by_member=summary == 'member'), output, '/tmp/mps_summary')
+    elif resample:
+        output_report(interests.resample(frequencies[resample]), output, '/tmp/mps_{}'.format(resample))
+    elif output:
+        # Every file is written from one pass over the interests - streamed a
+        # member page at a time as the pages are ingested, unless the whole
+        # result is shown on the console too
+        targets = get_targets(output, '/tmp/mps')
+        if targets:
+            interests.export(targets, stream=not is_console(output))
+        if is_console(output):
+            print(interests.to_table())
+            if interests.total:
+                print('TOTAL: £{:0,.2f}'.format(interests.total))
+    else:
+        interests.ingest()
+
+
+def output_report(report, outputs, file_name):
+    # file_name is the default path of file outputs, without an extension
+    for output_format, path in get_targets(outputs, file_name):
+        write_dataframe(report, output_format, path)
+        logger.info("Saved %s %s", output_format, path)
+    if is_console(outputs):
+        print(report.to_string(index=False))
+
+
+@main.group()
+def cache():
+    """Inspect the page and interests cache."""
+
+
+@cache.command()
+@click.option('--store', default='parquet', type=click.Choice(sorted(stores)), help="Store interests as Parquet files or in a SQLite database.")
+def status(store):
+    """Report which cached entries are stale."""
+    fresh, stale = page_cache.status()
+    print('Fetched pages: {} fresh, {} stale'.format(fresh, stale))
+
+    cache_status = list(Interests.get_cache_status(stores[store]()))
+    for title, is_member_page in [('Member pages', True), ('Interests', False)]:
+        entries = [(k, r) for k, r in cache_status if k.startswith('session=') == is_member_page]
+        stale_entries = [(k, r) for k, r in entries if r]
+        print('{}: {} fresh, {} stale'.format(
+            title, len(entries) - len(stale_entries), len(stale_entries)))
+        for cache_key, reason in stale_entries:
+            print('  {} ({})'.format(cache_key, reason))
+
+
+@main.command()
+@click.argument('old_session', type=click.Choice(Interests.get_sessions()))
+@click.argument('new_session', type=click.Choice(Interests.get_sessions()))
+@click.option('--member-name', '-mp', default=None, help='Compare specific member.')
+@click.option('--filter', '-f', default=None, help='Filter interests by term.')
+@click.option('--output', '-o', default=['console'], type=OutputType(), multiple=True, help=output_help)
+@click.option('--store', default='parquet', type=click.Choice(sorted(stores)), help="Store interests as Parquet files or in a SQLite database.")
+def diff(old_session, new_session, member_name, filter, output, store):
+    """List interests added, removed or changed between two sessions."""
+    store = stores[store]()
+    old, new = [Interests(s, member_name, store=store) for s in [old_session, new_session]]
+    if filter:
+        old.set_filter(filter)
+    changes = old.diff(new)
+    output_report(changes, output, '/tmp/mps_diff')
+    if is_console(output):
+        print(changes['change'].value_counts().reindex(['added', 'removed', 'changed'], fill_value=0).to_string())
+
+
+@main.command('reextract-amounts')
+@click.option('--output', '-o', default=['console'], type=OutputType(), multiple=True, help=output_help)
+@click.option('--store', default='parquet', type=click.Choice(sorted(stores)), help="Store interests as Parquet files or in a SQLite database.")
+def reextract_amounts(output, store):
+    """
+    Re-extract stored interests' amounts from their descriptions, listing those that changed.
+
+    Run after a change to amounts.py, which has its own fingerprint, to apply it without parsing the
+    register again. Only pages parsed by the current code are re-extracted, keeping amounts replaced
+    by errata - pages with changed amounts or earlier amount extraction are rewritten and marked with
+    the current amount fingerprint.
+    """
+    changes = stores[store]().reextract_amounts()
+    output_report(changes, output, '/tmp/mps_amounts')
+    if is_console(output):
+        print('Changed amounts: {}'.format(len(changes)))
+
+
+@main.command()
+@click.argument('sql')
+def query(sql):
+    """Run SQL against the SQLite store (populated with --store sqlite)."""
+    try:
+        print(SQLiteStore().query(sql).to_string(index=False))
+    except DatabaseError as e:
+        raise click.ClickException(str(e))
 
 
 if __name__ == '__main__':
@@ -1,59 +1,8 @@
-import abc
-import logging
-from mp_financial_interests.lib.helpers import normalise_member_name
-from mp_financial_interests.interest_types import interest_types
-from mp_financial_interests.erratum import InterestTypeErratum, ParentLineErratum, AmountErratum
-
-
-logger = logging.getLogger()
-
-
-class Errata:
-
-    def __init__(self, errata):
-        self._errata = {}
-        self._error_messages = self._get_error_messages()
-        for erratum in errata:
-            self.add_erratum(erratum)
-
-    @staticmethod
-    def _get_error_messages():
-        return {e.error_code: e.error_message for e in [
-            InterestTypeErratum, ParentLineErratum, AmountErratum]
-        }
-
-    def add_erratum(self, erratum):
-        self._errata.setdefault(erratum.error_code, []).append(erratum)
-
-    def get_erratum(self, error_code, filters):
-        filters_set = set(tuple(filters.items()))
-        for err in self._errata.get(error_code, []):
-            # ALl of the erratum filter on values must be present in the
-            # supplied filter params for the erratum to be a match
-            if err.filter_on.issubset(filters_set):
-                return err
-
-    def handle_error(self, error_code, interest, line, **filters):
-        filters['line'] = line.text
-        erratum = self.get_erratum(error_code, filters)
-        if erratum:
-            erratum.process_error(interest, line)
-            return erratum
-        else:
-            self._log_error(error_code, filters)
-            # print('''
-            #     AmountErratum(
-            #         member_name="{member_name}", session="{session}", line="{line}"
-            #     ),'''.format(member_name=filters.get('member_name'), line=line.text, session=filters.get('session'), ))
-
-    def _log_error(self, error_code, filters):
-        message = '{error_message} {member_name} ({session}) - {line}'.format(
-            error_message=self._error_messages[error_code],
-            **filters
-        )
-        logger.error(message)
+from mp_financial_interests.erratum import Errata, InterestTypeErratum, ParentLineErratum, AmountErratum
 
 
+# The errata themselves - fingerprinted as data (see cache.get_errata_fingerprint),
+# so the parser fingerprint covers how they're matched and applied in erratum.py
 errata = Errata(
     [
         # Some lines have been added as title <h3> etc., but are actually
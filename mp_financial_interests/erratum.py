@@ -1,4 +1,5 @@
 import abc
+import hashlib
 import logging
 from mp_financial_interests.lib.helpers import normalise_member_name
 from mp_financial_interests.interest_types import interest_types
@@ -30,6 +31,18 @@ class Erratum:
                 kwargs.get('member_name'))
         self.filter_on = set(tuple(kwargs.items()))
 
+    @property
+    def fingerprint(self):
+        # Hash of everything that changes how the erratum is applied - used to
+        # detect errata that have been added, edited or removed
+        params = sorted(
+            (k, sorted(v, key=lambda i: i[0]) if k == 'filter_on' else v)
+            for k, v in vars(self).items() if k != 'position'
+        )
+        return hashlib.sha1(
+            repr((self.__class__.__name__, params)).encode('utf-8')
+        ).hexdigest()
+
     @abc.abstractproperty
     def error_code(self):
         return None
@@ -78,3 +91,123 @@ class AmountErratum(Erratum):
         # We only commit if the replacement amount has been changed
         if self.replacement_amount:
             interest.set_amount(self.replacement_amount)
+
+
+# Fields an erratum can filter on - together with the error code, these
+# make up the key errata are indexed by
+FILTER_FIELDS = ('member_name', 'session', 'type_code', 'line')
+
+# Placeholder for a filter field the erratum doesn't specify, so it matches
+# any value. Not None, as an erratum can explicitly filter on a None value
+ANY = '*'
+
+
+class Errata:
+
+    def __init__(self, errata):
+        self._errata = {}
+        self._index = {}
+        self._member_index = {}
+        self._error_messages = self._get_error_messages()
+        for erratum in errata:
+            self.add_erratum(erratum)
+
+    @staticmethod
+    def _get_error_messages():
+        return {e.error_code: e.error_message for e in [
+            InterestTypeErratum, ParentLineErratum, AmountErratum]
+        }
+
+    def __len__(self):
+        return sum(len(e) for e in self._errata.values())
+
+    def add_erratum(self, erratum):
+        errata = self._errata.setdefault(erratum.error_code, [])
+        # Errata are matched in the order they are registered, so keep the
+        # position to pick the earliest match from the index
+        erratum.position = len(self)
+        errata.append(erratum)
+        key = self._get_index_key(erratum)
+        # An erratum filtering on a field errors aren't reported with can
+        # never match, so there is no need to index it
+        if key:
+            self._index.setdefault(key, []).append(erratum)
+            # Errata grouped by the member page they can apply to
+            self._member_index.setdefault(key[1:3], []).append(erratum)
+
+    @staticmethod
+    def _get_index_key(erratum):
+        filter_on = dict(erratum.filter_on)
+        if set(filter_on).difference(FILTER_FIELDS):
+            return None
+        return (erratum.error_code, ) + tuple(filter_on.get(f, ANY) for f in FILTER_FIELDS)
+
+    @staticmethod
+    def _get_lookup_keys(error_code, filters):
+        # Every combination of the supplied filter values and wildcards - an
+        # erratum matches if all the fields it filters on are equal
+        keys = [(error_code, )]
+        for field in FILTER_FIELDS:
+            value = filters.get(field)
+            keys = [k + (v, ) for k in keys for v in (value, ANY)]
+        return keys
+
+    def get_erratum(self, error_code, filters):
+        matches = []
+        for key in self._get_lookup_keys(error_code, filters):
+            try:
+                # Only the first registered erratum for a key can be a match
+                matches.append(self._index[key][0])
+            except (KeyError, TypeError):
+                # TypeError: unhashable filter value, can't match an erratum
+                continue
+        if matches:
+            return min(matches, key=lambda err: err.position)
+
+    @property
+    def fingerprint(self):
+        # Errata are matched in order, so the order is part of the fingerprint
+        errata = sorted((e for code in self._errata.values() for e in code),
+                        key=lambda err: err.position)
+        return self._get_fingerprint(errata)
+
+    def get_errata(self, error_code):
+        # All errata for an error code, in the order they are matched
+        return list(self._errata.get(error_code, []))
+
+    def get_member_errata(self, member_name, session):
+        # All errata that could apply to a member's page for a session
+        errata = []
+        for key in [(m, s) for m in (member_name, ANY) for s in (session, ANY)]:
+            errata += self._member_index.get(key, [])
+        return sorted(errata, key=lambda err: err.position)
+
+    def get_member_fingerprint(self, member_name, session):
+        return self._get_fingerprint(self.get_member_errata(member_name, session))
+
+    @staticmethod
+    def _get_fingerprint(errata):
+        sha1 = hashlib.sha1()
+        for erratum in errata:
+            sha1.update(erratum.fingerprint.encode('utf-8'))
+        return sha1.hexdigest()
+
+    def handle_error(self, error_code, interest, line, **filters):
+        filters['line'] = line.text
+        erratum = self.get_erratum(error_code, filters)
+        if erratum:
+            erratum.process_error(interest, line)
+            return erratum
+        else:
+            self._log_error(error_code, filters)
+            # print('''
+            #     AmountErratum(
+            #         member_name="{member_name}", session="{session}", line="{line}"
+            #     ),'''.format(member_name=filters.get('member_name'), line=line.text, session=filters.get('session'), ))
+
+    def _log_error(self, error_code, filters):
+        message = '{error_message} {member_name} ({session}) - {line}'.format(
+            error_message=self._error_messages[error_code],
+            **filters
+        )
+        logger.error(message)
@@ -0,0 +1,140 @@
+import gzip
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+
+from mp_financial_interests.lib.files import atomic_path
+
+
+def pence_to_pounds(pence):
+    """
+    Convert integer pence to an exact amount in pounds
+    @param pence: amount in pence
+    @return: Decimal
+    """
+    return Decimal(int(pence)).scaleb(-2)
+
+
+def pence_to_decimals(pence):
+    """
+    Vectorised pence_to_pounds - format a Series of integer pence as exact
+    decimal strings in pounds
+    @param pence: Series of int
+    @return: Series of str
+    """
+    absolute = pence.abs()
+    decimals = (absolute // 100).astype(str) + '.' + (absolute % 100).astype(str).str.zfill(2)
+    return decimals.where(pence >= 0, '-' + decimals)
+
+
+def open_output(file_name):
+    # Text output, gzipped if the file name ends in .gz
+    if file_name.endswith('.gz'):
+        return gzip.open(file_name, 'wt', encoding='utf-8', newline='')
+    return open(file_name, 'w', encoding='utf-8', newline='')
+
+
+def write_feather(dataframe, file_name):
+    """
+    Write a DataFrame as an Arrow IPC (Feather) file, keeping its column
+    types - categorical columns as dictionary encoded strings. Uncompressed,
+    so the file can be memory mapped and read without copying
+    """
+    table = pa.Table.from_pandas(dataframe, preserve_index=False)
+    with atomic_path(file_name) as path:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_feather(file_name):
+    """
+    Read an Arrow IPC (Feather) file as a DataFrame - memory mapped, so
+    numeric and string columns are views of the file rather than copies
+    """
+    with pa.memory_map(file_name) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+def write_json_lines(dataframe, file):
+    # An object per row, in UTF-8 - periods (e.g. resampled months) as strings
+    periods = [c for c, dtype in dataframe.dtypes.items() if isinstance(dtype, pd.PeriodDtype)]
+    dataframe = dataframe.astype({c: str for c in periods})
+    dataframe.to_json(file, orient='records', lines=True, date_format='iso', date_unit='s', force_ascii=False)
+
+
+class CSVWriter:
+
+    """
+    Writes batches of interests to a CSV file as they arrive, with a header
+    before the first. Amounts in pence are written as exact pounds
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self._header = True
+
+    def write(self, dataframe):
+        if 'amount' in dataframe:
+            dataframe = dataframe.assign(amount=pence_to_decimals(dataframe['amount']))
+        dataframe.to_csv(self.file, header=self._header, index=False)
+        self._header = False
+        # Each batch is readable as soon as it's written
+        self.file.flush()
+
+
+class JSONLinesWriter:
+
+    """
+    Writes batches of interests to a JSON Lines file as they arrive - an
+    object per interest. Amounts in pence are written in pounds
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, dataframe):
+        if 'amount' in dataframe:
+            dataframe = dataframe.assign(amount=dataframe['amount'] / 100)
+        if len(dataframe):
+            write_json_lines(dataframe, self.file)
+        self.file.flush()
+
+
+# Writers of each streamed output format
+writers = {
+    'csv': CSVWriter,
+    'jsonl': JSONLinesWriter,
+}
+
+# Default file extension of each output format
+extensions = {
+    'csv': 'csv',
+    'jsonl': 'jsonl',
+    'feather': 'arrow',
+}
+
+
+@contextmanager
+def open_writer(output_format, file_name):
+    """
+    A writer of interests in a streamed output format to file_name -
+    gzipped if the name ends in .gz. The file is complete when the context
+    exits
+    """
+    with open_output(file_name) as f:
+        yield writers[output_format](f)
+
+
+def write_dataframe(dataframe, output_format, file_name):
+    """Write a DataFrame as it is (e.g. a report) in an output format"""
+    if output_format == 'feather':
+        write_feather(dataframe, file_name)
+        return
+    with open_output(file_name) as f:
+        if output_format == 'csv':
+            dataframe.to_csv(f, index=False)
+        else:
+            write_json_lines(dataframe, f)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+
+# Columns identifying an interest - the session isn't included, as the register
+# is cumulative and declarations are repeated across editions and sessions
+FINGERPRINT_COLUMNS = ['member_name', 'title', 'date', 'amount', 'description']
+
+# Columns which stay the same when an interest's amount and date, or its
+# description, are edited - changed interests are matched on these
+CHANGE_KEYS = [
+    ['member_name', 'title', 'description'],
+    ['member_name', 'title', 'date', 'amount'],
+]
+
+DIFF_COLUMNS = ['change'] + FINGERPRINT_COLUMNS + ['previous_amount', 'previous_date', 'previous_description']
+
+
+def normalise_descriptions(descriptions):
+    return descriptions.fillna('').astype(str).str.lower().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+normalisers = {
+    'member_name': lambda s: s.astype(str),
+    'title': lambda s: s.astype(str).str.lower(),
+    'description': normalise_descriptions,
+}
+
+
+def get_interest_fingerprints(dataframe, columns=FINGERPRINT_COLUMNS):
+    """
+    Fingerprint each interest from its member, type, date, amount and
+    normalised description (or a subset of them), as a Series of 64 bit
+    hashes. The type is identified by its title, as type codes were
+    renumbered between codes of conduct
+    """
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        c: normalisers.get(c, lambda s: s)(dataframe[c]) for c in columns
+    }), index=False)
+
+
+def get_interest_ids(dataframe, url):
+    """
+    Ids of a member page's interests - a 64 bit hash of the page's URL and
+    session, the interest's fingerprint and its position among identical
+    interests on the page. So ids don't depend on the rest of the page, and
+    interests keep their ids when others are added or removed. Signed, to
+    fit SQLite's integer keys
+    """
+    fingerprints = get_interest_fingerprints(dataframe)
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        'url': url or '',
+        'session': dataframe['session'].astype(str).to_numpy(),
+        'fingerprint': fingerprints.to_numpy(),
+        'position': fingerprints.groupby(fingerprints).cumcount().to_numpy(),
+    }), index=False).to_numpy().view(np.int64)
+
+
+def _match(old, new, columns):
+    # Hash join the interests on the fingerprint of these columns - the nth
+    # interest with a fingerprint on one side is paired with the nth on the
+    # other, so repeated interests are matched one to one
+    sides = []
+    for dataframe in [old, new]:
+        fingerprints = get_interest_fingerprints(dataframe, columns)
+        sides.append(pd.DataFrame({
+            'fingerprint': fingerprints.to_numpy(),
+            'occurrence': fingerprints.groupby(fingerprints).cumcount().to_numpy(),
+            'position': np.arange(len(dataframe)),
+        }))
+    matched = sides[0].merge(sides[1], on=['fingerprint', 'occurrence'], suffixes=('_old', '_new'))
+    return matched['position_old'].to_numpy(), matched['position_new'].to_numpy()
+
+
+def _drop(dataframe, positions):
+    return dataframe.drop(index=dataframe.index[positions])
+
+
+def diff_interests(old, new):
+    """
+    Interests added, removed or changed between two sets of interests, as a
+    DataFrame of DIFF_COLUMNS ordered by member. Changed interests have
+    their new values, and their previous amount, date or description.
+
+    Identical interests are matched first, then the rest on their member,
+    type and either description (amount or date edits), or date and amount
+    (description edits) - each a hash join, linear in the number of
+    interests.
+    """
+    old = old[FINGERPRINT_COLUMNS].reset_index(drop=True)
+    new = new[FINGERPRINT_COLUMNS].reset_index(drop=True)
+    old_positions, new_positions = _match(old, new, FINGERPRINT_COLUMNS)
+    old, new = _drop(old, old_positions), _drop(new, new_positions)
+
+    changes = []
+    for columns in CHANGE_KEYS:
+        old_positions, new_positions = _match(old, new, columns)
+        changed = new.iloc[new_positions].assign(change='changed')
+        previous = old.iloc[old_positions]
+        for column in ['amount', 'date', 'description']:
+            changed['previous_' + column] = previous[column].to_numpy()
+        changes.append(changed)
+        old, new = _drop(old, old_positions), _drop(new, new_positions)
+
+    changes += [new.assign(change='added'), old.assign(change='removed')]
+    diff = pd.concat(changes, ignore_index=True).reindex(columns=DIFF_COLUMNS)
+    # Only the edited values are kept as previous
+    for column in ['amount', 'date', 'description']:
+        previous = 'previous_' + column
+        diff[previous] = diff[previous].where(diff[previous].ne(diff[column]))
+    return diff.sort_values(['member_name', 'change'], kind='stable').reset_index(drop=True)
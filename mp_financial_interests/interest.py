@@ -1,11 +1,10 @@
-import re
 import abc
 import logging
 
 
-from mp_financial_interests.lib.formatters import currency_to_float
-from mp_financial_interests.interest_types import interest_types
-from mp_financial_interests.lib.helpers import normalise_text, remove_remuneration_bands, decimalize
+from mp_financial_interests.amounts import parse_amount
+from mp_financial_interests.interest_types import get_interest_type
+from mp_financial_interests.lib.helpers import normalise_text, decimalize
 
 
 logger = logging.getLogger()
@@ -13,15 +12,13 @@ logger = logging.getLogger()
 
 class Interest:
 
-    # Regex for extracting money value from a string - eg: £1,000
-    re_amount = re.compile(
-        r".*?(?:£)(?:\s+)?([0-9,\.\-]+)", flags=re.MULTILINE | re.DOTALL)
-
-    def __init__(self, session, type_code=None):
+    def __init__(self, session, type_code=None, interest_type=None):
         self.session = session
         self.date = None
         self.lines = []
-        self._type = None
+        # Interest types are shared between interests, so an interest can be
+        # initialised with the previous interest's type without resolving it again
+        self._type = interest_type
         self._parent = None
         self._amount = None
         if type_code:
@@ -38,6 +35,10 @@ class Interest:
     def type_code(self):
         return self._type.type_code
 
+    @property
+    def interest_type(self):
+        return self._type
+
     def add_line(self, line):
         self.lines.append(line)
 
@@ -54,11 +55,11 @@ class Interest:
         self._amount = amount
 
     def _get_interest_type(self, type_code):
-        for interest_type in interest_types:
-            if interest_type.type_code == type_code and interest_type.is_code_of_conduct_for(self.session):
-                return interest_type
-        raise Exception('No interest type for code %s - %s',
-                        type_code, self.session)
+        try:
+            return get_interest_type(self.session, type_code)
+        except KeyError:
+            raise Exception('No interest type for code %s - %s',
+                            type_code, self.session)
 
     def set_type(self, type_code):
         self._type = self._get_interest_type(type_code)
@@ -77,6 +78,12 @@ class Interest:
             return self._parent + self.flattened_lines
         return self.flattened_lines
 
+    @property
+    def parent_length(self):
+        # Length of the parent line the description starts with - amounts
+        # are only extracted from the interest's own lines
+        return len(self.description) - len(self.flattened_lines)
+
     @property
     def amount(self):
         # Entries can be x times £, total £
@@ -88,24 +95,8 @@ class Interest:
     def parse_amount(self):
         self._amount = self._parse_maximum_amount_from_lines()
 
-    def _extract_amount_from_lines(self):
-        # Some interests include the renumeration band the interest falls into e.g. (£45,001-£50,000)
-        # So try extracting the amount without the bounds, and if that doesn't work, with the bands
-        for lines in [remove_remuneration_bands(self.flattened_lines), self.flattened_lines]:
-            amount = self.re_amount.findall(lines)
-            if amount:
-                return amount
-
     def _parse_maximum_amount_from_lines(self):
-        amount = self._extract_amount_from_lines()
-        if not amount:
-            return None
-        try:
-            # Always get the highest value - hopefully this will be the total
-            return max(list(map(currency_to_float, amount)))
-        except ValueError:
-            pass
-        return None
+        return parse_amount(self.flattened_lines)
 
     def amount_is_required(self):
         if self._type.amount_required:
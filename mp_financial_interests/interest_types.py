@@ -1,3 +1,4 @@
+from functools import lru_cache
 
 from mp_financial_interests.interest_type import InterestType2010, InterestType2015
 
@@ -31,3 +32,31 @@ interest_types = [
     InterestType2010(10, 'Loans and other controlled transactions'),
     InterestType2010(11, 'Miscellaneous'),
 ]
+
+
+code_of_conduct_years = sorted(
+    {t.code_of_conduct_year_published for t in interest_types}, reverse=True
+)
+
+# Interest types keyed by (code of conduct era, type code). The era is the
+# year the code of conduct applying to a session was published. As with the
+# interest_types list, the first listed type from the era or earlier wins
+interest_types_table = {}
+for era in code_of_conduct_years:
+    for interest_type in interest_types:
+        if interest_type.code_of_conduct_year_published <= era:
+            interest_types_table.setdefault((era, interest_type.type_code), interest_type)
+
+
+@lru_cache(maxsize=None)
+def get_code_of_conduct_era(session):
+    # The most recent code of conduct published before the session started
+    session_start_year = int(session.split('-')[0])
+    for year in code_of_conduct_years:
+        if session_start_year >= year:
+            return year
+    return None
+
+
+def get_interest_type(session, type_code):
+    return interest_types_table[(get_code_of_conduct_era(session), type_code)]
@@ -1,21 +1,32 @@
 
 from __future__ import absolute_import
-import re
 import pandas as pd
-from pandas import HDFStore
 import numpy as np
+from pandas.api.types import is_numeric_dtype
 import logging
-import warnings
+from contextlib import ExitStack
 
 
 from mp_financial_interests.register.index import RegisterIndexPage
-from mp_financial_interests.lib.helpers import normalise_member_name, decimalize
+from mp_financial_interests.register.member import RegisterMemberPage
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.store import InterestsStore, ROLLUP_KEYS, get_rollups
+from mp_financial_interests.search import DescriptionIndex
+from mp_financial_interests.query import Query
+from mp_financial_interests.fingerprints import FINGERPRINT_COLUMNS, get_interest_fingerprints, diff_interests
+from mp_financial_interests.members import normalise_variant
+from mp_financial_interests.exports import (
+    write_feather, read_feather, open_writer, pence_to_pounds, CSVWriter, JSONLinesWriter
+)
+from mp_financial_interests.lib.helpers import normalise_member_name
+from mp_financial_interests.lib.exceptions import MemberNameParseException
+from mp_financial_interests.cache import (
+    get_parser_fingerprint, get_amount_fingerprint, get_errata_fingerprint, get_member_errata_fingerprint
+)
 
 
 logger = logging.getLogger()
 
-warnings.filterwarnings('ignore', category=pd.io.pytables.PerformanceWarning)
-
 pd.options.display.float_format = '£{:,.2f}'.format
 
 
@@ -23,6 +34,7 @@ class Interests:
 
     columns = [
         'member_name',
+        'member_id',
         'title',
         'type_code',
         'amount',
@@ -31,119 +43,561 @@ class Interests:
         'session',
     ]
 
-    def __init__(self, session=None, member_name=None, clear_cache=False):
+    # Percentiles of amounts included in the summary
+    summary_percentiles = [0.25, 0.5, 0.75, 0.9]
+
+    # Description indexes of fewer interests (e.g. a page being streamed) are
+    # built as needed, rather than cached
+    min_cached_index_rows = 1000
+
+    def __init__(self, session=None, member_name=None, clear_cache=False, store=None, dataframe=None, ingest=True):
         self.session = session
         self.member_name = member_name
-        self._group_by = set()
-        self._filter = None
-        self._order_by = None
-        self.cache = HDFStore('/tmp/mp_cache.h5')
-        cache_key = self._replace_invalid_charcaters('_'.join(filter(None, [
-            'mp',
-            session,
-            self.member_name
-        ]
-        )))
+        # The query applied by data, total and the outputs
+        self.query = Query()
+        self._results = {}
+        self._builder = InterestsBuilder(self.columns)
+        self.store = store or InterestsStore()
+        self._clear_cache = clear_cache
+        self._index = None
+        # Member pages (session, member name) making up these interests -
+        # they are only read from the store when first needed
+        self._pages = []
+        self._ingested = False
+        self._loaded = False
+        # Whether interests not in the store have been added
+        self._added = False
+        self._description_index = None
+        # Batches of a streamed result don't cache their description index,
+        # which would push the whole result's out of the cache
+        self._cache_index = True
+        self._filter_masks = {}
+        self._interest_fingerprints = None
+        if dataframe is not None:
+            # Interests loaded elsewhere (e.g. an export) are queried as they
+            # are, rather than ingested from the register
+            self._builder.add_dataframe(dataframe)
+            self._loaded = self._added = self._ingested = True
+        elif ingest:
+            self.ingest()
+
+    def ingest(self):
+        for _ in self.iter_pages():
+            pass
+
+    def iter_pages(self):
+        """
+        Member pages (session, member name) making up these interests, each
+        yielded as soon as it's in the store. Queries for any session or
+        member are answered from what has already been ingested - only pages
+        not yet in the store are parsed
+        """
+        for page, _ in self._iter_pages():
+            yield page
+
+    def _iter_pages(self):
+        # Each page, and whether it was parsed rather than already stored
+        if self._ingested:
+            for page in self._pages:
+                yield page, False
+            return
+        self._pages = []
+        self._updated = False
+        manifests = ((session, self._get_session_manifest(session)) for session in self._get_sessions())
+        member_name = None
+        if self.member_name:
+            # Every session's members are recorded first, so the member is
+            # resolved once, against all of them
+            manifests = list(manifests)
+            member_name = self._resolve_member_name()
+        for session, manifest in manifests:
+            if manifest is None:
+                continue
+            for page, parsed in self._get_session_pages(session, manifest, member_name):
+                self._pages.append(page)
+                yield page, parsed
+        if self._updated:
+            self.store.compact()
+        self._ingested = True
+
+    @property
+    def pages(self):
+        if not self._ingested:
+            self.ingest()
+        return self._pages
+
+    @property
+    def index(self):
+        if not self._index:
+            self._index = RegisterIndexPage()
+        return self._index
+
+    @staticmethod
+    def _read_manifest(store, key, clear_cache=False):
+        # Read a manifest - raising KeyError if it's stale
         if clear_cache:
-            self.clear_cache(cache_key)
+            raise KeyError(key)
+        manifest = store.read_manifest(key)
+        if manifest.get('parser_fingerprint') != get_parser_fingerprint():
+            logger.info("Cached %s is stale (parser changed).", key)
+            raise KeyError(key)
+        return manifest
+
+    @staticmethod
+    def _write_sessions(store, index):
+        sessions = list(index.keys())
+        store.write_manifest('sessions', sessions=sessions, parser_fingerprint=get_parser_fingerprint())
+        return sessions
 
+    @classmethod
+    def get_sessions(cls, store=None, clear_cache=False):
+        # Sessions in the register - from the store if they've been ingested
+        store = store or InterestsStore()
         try:
-            self._dataframe = self.cache[cache_key]
+            return cls._read_manifest(store, 'sessions', clear_cache)['sessions']
         except KeyError:
-            self._dataframe = pd.DataFrame(
-                columns=self.columns
-            )
-            self._parse_registers()
-            self.cache[cache_key] = self._dataframe
+            return cls._write_sessions(store, RegisterIndexPage())
+
+    def _get_sessions(self):
+        if self.session:
+            return [self.session]
+        try:
+            return self._read_manifest(self.store, 'sessions', self._clear_cache)['sessions']
+        except KeyError:
+            return self._write_sessions(self.store, self.index)
 
     @staticmethod
-    def _replace_invalid_charcaters(member_name):
+    def _get_session_manifest_key(session):
+        return 'session_{}'.format(session)
+
+    def _get_session_manifest(self, session):
+        # The session's members - or None if it isn't in the register
+        manifest_key = self._get_session_manifest_key(session)
         try:
-            return member_name.replace(' ', '_').replace(',', '').replace('-', '_').lower()
-        except AttributeError:
+            return self._read_manifest(self.store, manifest_key, self._clear_cache)
+        except KeyError:
+            # Walk the session's members page, recording the members to the store
+            try:
+                member_pages = list(self.index[session].members_page)
+            except KeyError:
+                logger.error("Session %s not found.", session)
+                return None
+            manifest = {
+                'members': [[p.member_name, p.url] for p in member_pages],
+                'parser_fingerprint': get_parser_fingerprint(),
+            }
+            self.store.update_members((p.member_name, p.name_variants) for p in member_pages)
+            self.store.write_manifest(manifest_key, **manifest)
+            return manifest
+
+    def _get_session_pages(self, session, manifest, member_name=None):
+        manifest_key = self._get_session_manifest_key(session)
+        member_pages = [RegisterMemberPage(m, session, url) for m, url in manifest['members']]
+        if self.member_name:
+            member_pages = [p for p in member_pages if p.member_name == member_name]
+
+        # The manifest is marked complete with the errata and amount fingerprints
+        # once every page in the session has been ingested - so pages don't need
+        # checking
+        check_pages = self._clear_cache or \
+            manifest.get('errata_fingerprint') != get_errata_fingerprint() or \
+            manifest.get('amount_fingerprint') != get_amount_fingerprint()
+        for member_page in member_pages:
+            parsed = check_pages and not self._is_member_page_cached(member_page)
+            if parsed:
+                self._parse_member_page(member_page)
+            yield (session, member_page.member_name), parsed
+        if check_pages and not self.member_name:
+            manifest['errata_fingerprint'] = get_errata_fingerprint()
+            manifest['amount_fingerprint'] = get_amount_fingerprint()
+            self.store.write_manifest(manifest_key, **manifest)
+
+    def _resolve_member_name(self):
+        # The member --member-name refers to, in any session - matched
+        # approximately if it isn't a known name
+        member_name = self.store.read_members().resolve(self.member_name)
+        if member_name is None:
+            try:
+                return normalise_member_name(self.member_name)
+            except MemberNameParseException:
+                logger.error("Member %s not found.", self.member_name)
+                return None
+        if normalise_variant(member_name) != normalise_variant(self.member_name):
+            logger.info("Matched member %s to %s.", self.member_name, member_name)
+        return member_name
+
+    @staticmethod
+    def _get_fingerprints():
+        return {
+            'parser_fingerprint': get_parser_fingerprint(),
+            'amount_fingerprint': get_amount_fingerprint(),
+            'errata_fingerprint': get_errata_fingerprint(),
+        }
+
+    @staticmethod
+    def _get_stale_reason(metadata):
+        # Why a cached entry is stale - or None if it's still fresh
+        if metadata.get('parser_fingerprint') != get_parser_fingerprint():
+            return 'parser changed'
+        if 'errata_fingerprint' not in metadata:
+            # Lists of sessions and members don't depend on the errata
+            return None
+        if metadata.get('amount_fingerprint') != get_amount_fingerprint():
+            return 'amount extraction changed'
+        if metadata['errata_fingerprint'] == get_errata_fingerprint():
             return None
+        # Member pages only need reprocessing if errata
+        # applying to them were added, changed or removed
+        member_name = metadata.get('member_name')
+        if member_name:
+            member_errata_fingerprint = get_member_errata_fingerprint(member_name, metadata['session'])
+            if metadata.get('member_errata_fingerprint') == member_errata_fingerprint:
+                return None
+        return 'errata changed'
 
-    def _parse_registers(self):
-        index = RegisterIndexPage()
-        for session_register in index:
-            # If user has specified annual session, skip any non-matching sessions
-            if self.session and self.session != session_register.session:
-                continue
+    @classmethod
+    def get_cache_status(cls, store=None):
+        # Yield each cached entry, with the reason it's stale (None if fresh)
+        for key, metadata in (store or InterestsStore()).entries():
+            yield key, cls._get_stale_reason(metadata)
 
-            for member_page in session_register.members_page:
-                if self.member_name and normalise_member_name(self.member_name) != member_page.member_name:
-                    continue
+    def _is_member_page_cached(self, member_page):
+        if self._clear_cache:
+            return False
+        try:
+            metadata = self.store.read_page_metadata(member_page.session, member_page.member_name)
+        except KeyError:
+            return False
+        return not self._get_stale_reason(metadata)
 
-                logger.info("Processing member %s - %s (%s).",
-                            member_page.member_name, session_register.session, member_page.url)
-                for interest in member_page.get_interests():
-                    self.add_interest(member_page.member_name, interest)
+    def _parse_member_page(self, member_page):
+        logger.info("Processing member %s - %s (%s).",
+                    member_page.member_name, member_page.session, member_page.url)
+        builder = InterestsBuilder(self.columns + self.store.extraction_columns)
+        for interest in member_page.get_interests():
+            builder.add_interest(member_page.member_name, interest)
+        # Each member page's interests are materialised as a batch, and
+        # stored tagged with the errata that fired on it
+        self.store.write_page(
+            member_page.session,
+            member_page.member_name,
+            builder.dataframe,
+            url=member_page.url,
+            member_errata_fingerprint=get_member_errata_fingerprint(
+                member_page.member_name, member_page.session),
+            errata=member_page.errata,
+            **self._get_fingerprints()
+        )
+        self._updated = True
 
     def add_interest(self, member_name, interest):
-        row = [member_name]
-        row += [getattr(interest, c)
-                for c in self.columns if c != 'member_name']
-        self._dataframe.loc[len(self._dataframe)] = row
+        self._builder.add_interest(member_name, interest)
+        self._added = True
+        self._results.clear()
+
+    @property
+    def _dataframe(self):
+        if not self._loaded:
+            self._builder.add_dataframe(self.store.read(self.pages))
+            self._loaded = True
+        return self._builder.dataframe
+
+    def _get_totals_dataframe(self):
+        # Only read the amount and group keys from the store, unless
+        # the full interests have already been loaded
+        if self._loaded or len(self._builder):
+            return self._dataframe
+        return self.store.read_totals(self.pages)
+
+    def _get_rollups_dataframe(self):
+        # Totals per member, session and type - maintained by the store
+        # at ingest, unless interests have been added since
+        if self._added:
+            return get_rollups(self._dataframe)
+        return self.store.read_rollups(self.pages)
 
     @property
     def total(self):
-        self._group_by = []
-        return decimalize(self.data['amount'].sum())
+        return pence_to_pounds(self._execute(self.query.get_totals())['amount'].sum())
 
     @property
     def member_total(self):
-        self.set_group_by(['member_name'])
-        return self.data
+        return self.get_data(self.query.set_group_by(['member_name']))
 
     @property
     def member_total_per_session(self):
-        self.set_group_by(['member_name', 'session'])
-        return self.data
+        return self.get_data(self.query.set_group_by(['member_name', 'session']))
 
     @property
     def data(self):
-        df = self._dataframe
-        if self._filter:
-            df = df[self._dataframe['description'].str.contains(
-                self._filter, flags=re.IGNORECASE)]
-        if self._group_by:
-            df = df.groupby(tuple(self._group_by))[
+        return self.get_data(self.query)
+
+    def get_data(self, query):
+        # Amounts are stored in pence, and only converted to pounds for output
+        df = self._execute(query)
+        if 'amount' in df:
+            df = df.assign(amount=df['amount'] / 100)
+        return df
+
+    def _execute(self, query):
+        # Results are memoised per query, so the outputs and totals
+        # don't repeat passes over the interests
+        if query not in self._results:
+            self._results[query] = self._run(query)
+        return self._results[query]
+
+    def _run(self, query):
+        # Grouped queries are answered from the rollups, and others not
+        # needing descriptions only read amounts and group keys
+        if query.can_use_rollups(ROLLUP_KEYS):
+            df = self._get_rollups_dataframe()
+        elif query.reads_only(self.store.totals_columns):
+            df = self._get_totals_dataframe()
+        else:
+            df = self._dataframe
+        mask = self._get_mask(query, df)
+        if mask is not None:
+            df = df[mask]
+        if query.group_by:
+            df = df.groupby(list(query.group_by), observed=True)[
                 'amount'].sum().reset_index()
-        if self._order_by:
-            df = df.sort_values(self._order_by, ascending=False)
+        if query.order_by and query.limit is not None and is_numeric_dtype(df[query.order_by]):
+            # Select the largest, rather than sorting everything
+            df = df.nlargest(query.limit, query.order_by)
+        else:
+            if query.order_by:
+                df = df.sort_values(query.order_by, ascending=False)
+            if query.limit is not None:
+                df = df.head(query.limit)
+        if query.columns:
+            df = df[list(query.columns)]
         return df
 
+    def _get_mask(self, query, df):
+        # Rows of the interests selected by the query's filter, date range and
+        # deduping - or None for all rows. Each mask is over every interest, so
+        # they can be memoised and combined
+        masks = []
+        if query.filter:
+            masks.append(self._get_filter_mask(query.filter))
+        if query.has_date_range:
+            masks.append(self._get_date_mask(df['date'], query.date_from, query.date_to))
+        if query.dedupe:
+            masks.append(self._get_unique_mask())
+        return np.logical_and.reduce(masks) if masks else None
+
+    def _get_interest_fingerprints(self):
+        dataframe = self._dataframe
+        if self._interest_fingerprints is None or len(self._interest_fingerprints) != len(dataframe):
+            self._interest_fingerprints = get_interest_fingerprints(dataframe)
+        return self._interest_fingerprints
+
+    def _get_unique_mask(self):
+        # The first of each repeated declaration - interests are
+        # in session order, so its earliest session
+        return ~self._get_interest_fingerprints().duplicated().to_numpy()
+
+    @property
+    def repeats(self):
+        """Interests repeating an earlier declaration, within the query's filters"""
+        query = self.query.set_dedupe(False)
+        mask = ~self._get_unique_mask()
+        query_mask = self._get_mask(query, self._dataframe)
+        if query_mask is not None:
+            mask &= query_mask
+        df = self._dataframe[mask]
+        return df.assign(amount=df['amount'] / 100)
+
+    @property
+    def description_index(self):
+        dataframe = self._dataframe
+        if self._description_index is None or len(self._description_index) != len(dataframe):
+            if not self._cache_index or len(dataframe) < self.min_cached_index_rows:
+                self._description_index = DescriptionIndex.build(dataframe['description'])
+            else:
+                self._description_index = DescriptionIndex.load_or_build(dataframe['description'])
+        return self._description_index
+
+    def _get_filter_mask(self, term):
+        # Rows matching the filter - memoised, as data, totals and
+        # the output all apply the filter
+        key = (term, len(self._dataframe))
+        if key not in self._filter_masks:
+            self._filter_masks[key] = self.description_index.search(
+                self._dataframe['description'], term)
+        return self._filter_masks[key]
+
+    @staticmethod
+    def _get_date_mask(dates, date_from, date_to):
+        # Rows registered within the range - missing dates never are
+        dates = dates.to_numpy()
+        mask = np.ones(len(dates), dtype=bool)
+        if date_from is not None:
+            mask &= dates >= date_from.to_datetime64()
+        if date_to is not None:
+            mask &= dates <= date_to.to_datetime64()
+        return mask
+
     def group_by_member(self):
-        self._group_by.add('member_name')
+        self.query = self.query.add_group_by('member_name')
 
     def group_by_session(self):
-        self._group_by.add('session')
+        self.query = self.query.add_group_by('session')
+
+    def group_by_type(self):
+        self.query = self.query.add_group_by('type_code')
 
     def set_group_by(self, group_by):
-        self._group_by = group_by
+        self.query = self.query.set_group_by(group_by)
 
     def set_order_by(self, order_by):
-        self._order_by = order_by
+        self.query = self.query.set_order_by(order_by)
+
+    def set_limit(self, limit):
+        self.query = self.query.set_limit(limit)
 
     def filter_by_type(self, type_code):
         return self.data[self.data['type_code'] == type_code]
 
     def total_by_type(self, type_code):
-        return decimalize(self.filter_by_type(type_code)['amount'].sum())
+        df = self._execute(self.query.get_totals())
+        return pence_to_pounds(df[df['type_code'] == type_code]['amount'].sum())
 
     def set_filter(self, term):
-        self._filter = term
+        self.query = self.query.set_filter(term)
+
+    def set_date_range(self, date_from=None, date_to=None):
+        self.query = self.query.set_date_range(date_from, date_to)
+
+    def set_dedupe(self, dedupe=True):
+        self.query = self.query.set_dedupe(dedupe)
+
+    def summary(self, by_member=False):
+        """
+        Count, total, mean, max and percentiles of the filtered interests'
+        amounts per type and session (and member), in pounds - with the
+        number of interests without an amount, which the statistics leave out
+        """
+        group_by = ['type_code', 'session'] + (['member_name'] if by_member else [])
+        df = self._execute(self.query.get_amounts(group_by))
+        # Missing amounts are stored as 0
+        df = df.assign(amount=df['amount'].where(df['amount'] > 0), no_amount=df['amount'] == 0)
+        # Every statistic is computed from the same grouping
+        groups = df.groupby(group_by, observed=True, sort=True)
+        grouped = groups['amount']
+        summary = grouped.agg(['count', 'sum', 'mean', 'max'])
+        summary.insert(1, 'no_amount', groups['no_amount'].sum())
+        percentiles = grouped.quantile(self.summary_percentiles).unstack()
+        percentiles.columns = ['p{:g}'.format(p * 100) for p in percentiles.columns]
+        summary = summary.join(percentiles)
+        amount_columns = [c for c in summary.columns if c not in ['count', 'no_amount']]
+        summary[amount_columns] = summary[amount_columns] / 100
+        return summary.reset_index()
+
+    def resample(self, frequency='M'):
+        """
+        Total amount and number of the filtered interests per calendar month
+        ('M') or quarter ('Q') of their registration date, split by the
+        query's grouping - amounts in pounds
+        """
+        keys = list(self.query.group_by)
+        df = self._execute(self.query.get_amounts(keys + ['date']))
+        # Interests without a date aren't in any period
+        resampled = df.groupby(
+            [df['date'].dt.to_period(frequency).rename('period')] + keys, observed=True
+        )['amount'].agg(amount='sum', count='count').reset_index()
+        resampled['amount'] = resampled['amount'] / 100
+        return resampled
+
+    def diff(self, other):
+        """
+        Interests added, removed or changed in other (e.g. a later session)
+        since these, per member - both filtered by this query. Amounts in
+        pounds
+        """
+        columns = [c for c in FINGERPRINT_COLUMNS if c != 'amount']
+        query = self.query.get_amounts(columns)
+        diff = diff_interests(self._execute(query), other._execute(query))
+        for column in ['amount', 'previous_amount']:
+            diff[column] = diff[column] / 100
+        return diff
 
     def to_table(self):
         return self.data.to_string(header=True)
 
     def to_csv(self, file_name):
-        self._dataframe['amount'] = self._dataframe['amount'].astype(float)
-        self.data.to_csv(file_name, encoding='utf-8')
+        with open(file_name, 'w', encoding='utf-8', newline='') as f:
+            CSVWriter(f).write(self._execute(self.query))
         logger.info("Saved CSV %s", file_name)
 
-    def clear_cache(self, cache_key):
-        try:
-            self.cache.remove(cache_key)
-        except KeyError:
-            pass
+    def to_jsonl(self, file_name):
+        with open(file_name, 'w', encoding='utf-8') as f:
+            JSONLinesWriter(f).write(self._execute(self.query))
+        logger.info("Saved JSON Lines %s", file_name)
+
+    def export(self, targets, stream=True):
+        """
+        Write the interests selected by the query to several (output format,
+        file name) targets from one pass over them. While pages are still to
+        be ingested, and the query allows, CSV and JSON Lines are streamed
+        as the pages are parsed - unless stream is False (e.g. the whole
+        result is needed anyway). Feather is written from the whole result
+        """
+        stream = (stream and self.query.can_stream and not self._ingested and
+                  'feather' not in [f for f, _ in targets])
+        with ExitStack() as stack:
+            if stream:
+                self.stream([stack.enter_context(open_writer(f, file_name)) for f, file_name in targets])
+            else:
+                data = self._execute(self.query)
+                for output_format, file_name in targets:
+                    if output_format == 'feather':
+                        write_feather(data, file_name)
+                    else:
+                        stack.enter_context(open_writer(output_format, file_name)).write(data)
+        for output_format, file_name in targets:
+            logger.info("Saved %s %s", output_format, file_name)
+
+    def stream(self, writers):
+        """
+        Write the interests selected by the query to each writer a member page
+        at a time, as soon as the page is parsed - so output starts before the
+        register has been ingested. Pages already stored are written a
+        session at a time. Only queries answered a page at a time (filters
+        and date ranges) can be streamed
+        """
+        if not self.query.can_stream:
+            raise ValueError("Grouped, ordered, limited or deduped queries can't be streamed")
+        # Reading stored pages one by one would scan their session's
+        # compacted file for each
+        stored = []
+        for page, parsed in self._iter_pages():
+            if stored and (parsed or stored[-1][0] != page[0]):
+                self._write_pages(writers, stored)
+                stored = []
+            if parsed:
+                self._write_pages(writers, [page])
+            else:
+                stored.append(page)
+        self._write_pages(writers, stored)
+
+    def _write_pages(self, writers, pages):
+        dataframe = self.store.read(pages=pages, columns=self.columns)
+        if not len(dataframe):
+            return
+        batch = Interests(store=self.store, dataframe=dataframe)
+        batch._cache_index = False
+        data = batch._execute(self.query)
+        for writer in writers:
+            writer.write(data)
+
+    def to_feather(self, file_name):
+        # Amounts are kept in pence, so the export loads back exactly
+        write_feather(self._execute(self.query), file_name)
+        logger.info("Saved Arrow file %s", file_name)
+
+    @classmethod
+    def from_feather(cls, file_name):
+        """Interests exported by to_feather, memory mapped from the file"""
+        return cls(dataframe=read_feather(file_name))
+
@@ -0,0 +1,127 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from mp_financial_interests.lib.formatters import pounds_to_pence, parse_date
+
+
+class InterestsBuilder:
+
+    """
+    Accumulates interests in column buffers, which are materialised into a
+    DataFrame once per batch - rather than reallocating the DataFrame for
+    every interest added.
+    """
+
+    # Numeric columns are buffered in typed arrays - amounts as integer pence
+    # so they sum exactly. Missing values are stored as 0
+    typecodes = {
+        'member_id': 'i',
+        'type_code': 'b',
+        'amount': 'q',
+        'parent_length': 'i',
+        'id': 'q',
+        'revision': 'q',
+    }
+
+    converters = {
+        'amount': pounds_to_pence,
+        'date': parse_date,
+    }
+
+    # Columns of dates - unparseable dates are stored as NaT
+    datetime_columns = {
+        'date': 'datetime64[s]',
+    }
+
+    # Columns with a small set of values repeated across rows
+    categorical_columns = ['member_name', 'title', 'session']
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._frames = []
+        self._reset_buffers()
+
+    def __len__(self):
+        return len(self._buffers[self.columns[0]]) + sum(len(f) for f in self._frames)
+
+    def _reset_buffers(self):
+        self._buffers = {
+            c: array(self.typecodes[c]) if c in self.typecodes else []
+            for c in self.columns
+        }
+
+    def add_interest(self, member_name, interest):
+        for column, buffer in self._buffers.items():
+            if column == 'member_name':
+                value = member_name
+            else:
+                value = getattr(interest, column, None)
+            if value is not None and column in self.converters:
+                value = self.converters[column](value)
+            if value is None and column in self.typecodes:
+                value = 0
+            buffer.append(value)
+
+    def add_dataframe(self, dataframe):
+        self.flush()
+        if len(dataframe):
+            self._frames.append(self.astype(dataframe))
+
+    @classmethod
+    def astype(cls, dataframe):
+        # Cast a DataFrame of interests to the builder's column types
+        dtypes = {c: 'category' for c in cls.categorical_columns}
+        dtypes.update({c: np.dtype(t) for c, t in cls.typecodes.items()})
+        dtypes.update(cls.datetime_columns)
+        dataframe = dataframe.astype({c: t for c, t in dtypes.items() if c in dataframe})
+        # Sort categories, so ordering by a categorical column is alphabetical
+        for column in cls.categorical_columns:
+            if column in dataframe and not dataframe[column].cat.categories.is_monotonic_increasing:
+                dataframe[column] = dataframe[column].cat.reorder_categories(
+                    sorted(dataframe[column].cat.categories))
+        return dataframe
+
+    def flush(self):
+        # Materialise the buffered interests as a batch - returns the batch
+        buffers = self._buffers
+        self._reset_buffers()
+        batch = pd.DataFrame({
+            c: self._get_column(c, b) for c, b in buffers.items()
+        }, columns=self.columns)
+        if len(batch):
+            self._frames.append(batch)
+        return batch
+
+    def _get_column(self, column, buffer):
+        if column in self.typecodes:
+            return np.array(buffer, dtype=buffer.typecode)
+        elif column in self.datetime_columns:
+            return np.array(buffer, dtype=self.datetime_columns[column])
+        elif column in self.categorical_columns:
+            return pd.Categorical(buffer)
+        return buffer
+
+    @property
+    def dataframe(self):
+        batch = self.flush()
+        if len(self._frames) > 1:
+            # Combine the batches, so they're only concatenated once
+            self._frames = [self._concat(self._frames)]
+        return self._frames[0] if self._frames else batch
+
+    def _concat(self, frames):
+        categorical_columns = [c for c in self.categorical_columns if c in self.columns]
+        dataframe = pd.concat(
+            [f.drop(columns=categorical_columns) for f in frames], ignore_index=True
+        )
+        # Batches have different categories, so union them rather than
+        # letting concat fall back to object columns. Categories are sorted
+        # so ordering by a categorical column is alphabetical
+        for column in categorical_columns:
+            dataframe[column] = union_categoricals(
+                [f[column] for f in frames], sort_categories=True
+            )
+        return dataframe[self.columns]
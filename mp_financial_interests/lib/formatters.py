@@ -1,39 +1,38 @@
 import re
+import datetime
 from decimal import Decimal
+from functools import lru_cache
 
 
-def currency_to_float(currency):
+re_date_parts = re.compile(r'([0-9]{1,2})\s*([a-z]+)\s*([0-9]{4})', re.IGNORECASE)
+
+
+def pounds_to_pence(amount):
     """
-    Convert currency string to int
-    @param str: currency to convert
+    Convert an amount in pounds to integer pence
+    @param amount: amount in pounds
     @return: int
     """
+    return int((Decimal(str(amount)) * 100).to_integral_value())
 
-    currency = currency.strip()
-
-    # If that last char is a full stop, remove it
-    currency = currency.rstrip('.')
-
-    # If the last char is a - remove it
-    currency = currency.rstrip('-')
-
-    # Common problem is adding extra decimal points, instead of thousands comma separator
-    # SO if we have more than one decimal point, remove it
-    if currency.count('.') > 1:
-        currency = currency.replace('.', '', currency.count('.') - 1)
 
-    # Some currency values have a range: e.g.: Spencer, Mark 20-14-15: £5-10,000
-    # We want to make sure these aren't recorded as £5, so - is included in the regex
-    # But we want to split on it and take the upper bounds
-    if '-' in currency:
-        currency = currency.split('-')[1]
-
-    value = re.sub(r'[^\d.]', '', currency.replace(',', '').rstrip('.'))
-
-    try:
-        value = Decimal(value)
-    except AttributeError:
-        print('Could not parse amount: %s' % currency)
-        raise
-
-    return float(value)
+@lru_cache(maxsize=None)
+def parse_date(date):
+    """
+    Parse a registration date - i.e. 4 October 2012. The register has few
+    distinct dates, so parsed dates are memoised
+    @param date: date string
+    @return: date, or None if it can't be parsed
+    """
+    m = re_date_parts.search(date)
+    if not m:
+        return None
+    day, month, year = m.groups()
+    # Months are sometimes abbreviated - i.e. 4 Oct 2012
+    for month_format in ['%B', '%b']:
+        try:
+            return datetime.datetime.strptime(
+                '{} {} {}'.format(day, month, year), '%d {} %Y'.format(month_format)).date()
+        except ValueError:
+            pass
+    return None
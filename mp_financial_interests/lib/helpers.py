@@ -1,4 +1,3 @@
-import os
 import re
 from urllib.parse import urlparse, urlunparse
 from itertools import chain
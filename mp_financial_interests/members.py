@@ -0,0 +1,129 @@
+import re
+from collections import Counter
+
+import pandas as pd
+
+from mp_financial_interests.lib.helpers import normalise_member_name
+from mp_financial_interests.lib.exceptions import MemberNameParseException
+
+
+re_non_word = re.compile(r'[\W_]+')
+
+# Minimum similarity of a name to a member's, for it to match approximately
+MIN_SIMILARITY = 0.5
+
+
+def normalise_variant(name):
+    # Names are compared lowercased, ignoring punctuation and spacing
+    return re_non_word.sub(' ', name.lower()).strip()
+
+
+def get_trigrams(name):
+    # Words are sorted, so names match whichever order they're written in
+    padded = '  {} '.format(' '.join(sorted(normalise_variant(name).split())))
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Members:
+
+    """
+    Canonical table of members - each normalised member name has an integer
+    id, and every variant of the name seen in the register (with or without
+    honorifics, in different cases) maps to it.
+
+    Names are resolved to a member by their normalised name or a variant,
+    falling back to the most similar variant - by the trigrams they share,
+    looked up in an index of the variants' trigrams.
+    """
+
+    columns = ['member_id', 'member_name', 'variant']
+
+    def __init__(self, dataframe=None):
+        self.member_names = {}
+        self._member_ids = {}
+        self._variants = {}
+        self._trigram_index = None
+        if dataframe is not None:
+            for member_id, member_name, variant in dataframe[self.columns].itertuples(index=False):
+                self.member_names[int(member_id)] = member_name
+                self._member_ids[member_name] = int(member_id)
+                self._variants[normalise_variant(variant)] = int(member_id)
+
+    def __len__(self):
+        return len(self.member_names)
+
+    def to_dataframe(self):
+        return pd.DataFrame(
+            [(i, self.member_names[i], v) for v, i in self._variants.items()], columns=self.columns
+        ).sort_values(['member_id', 'variant'], ignore_index=True)
+
+    def add(self, member_name, variants=()):
+        """Add a member and its name variants - returns whether the table changed"""
+        changed = False
+        member_id = self.get_id(member_name)
+        if member_id is None:
+            # Ids start at 1, so 0 can mean an unknown member
+            member_id = max(self.member_names, default=0) + 1
+            self.member_names[member_id] = member_name
+            self._member_ids[member_name] = member_id
+            changed = True
+        for variant in [member_name] + list(variants):
+            variant = normalise_variant(variant)
+            if variant and variant not in self._variants:
+                self._variants[variant] = member_id
+                changed = True
+        if changed:
+            self._trigram_index = None
+        return changed
+
+    def get_id(self, member_name):
+        """The id of a normalised member name - None if it isn't in the table"""
+        return self._member_ids.get(member_name)
+
+    @property
+    def trigram_index(self):
+        # Positions of the variants containing each trigram, and the member
+        # id and number of trigrams of the variant at each position
+        if self._trigram_index is None:
+            index = {}
+            variants = []
+            for position, (variant, member_id) in enumerate(self._variants.items()):
+                trigrams = get_trigrams(variant)
+                for trigram in trigrams:
+                    index.setdefault(trigram, []).append(position)
+                variants.append((member_id, len(trigrams)))
+            self._trigram_index = index, variants
+        return self._trigram_index
+
+    def search(self, name, limit=5):
+        """
+        Members most similar to name, as (member name, similarity) pairs -
+        similarity is the Dice coefficient of the names' trigrams
+        """
+        index, variants = self.trigram_index
+        trigrams = get_trigrams(name)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(index.get(trigram, []))
+        similarities = {}
+        for position, count in shared.items():
+            member_id, number_of_trigrams = variants[position]
+            similarity = 2 * count / (len(trigrams) + number_of_trigrams)
+            similarities[member_id] = max(similarity, similarities.get(member_id, 0))
+        ranked = sorted(similarities.items(), key=lambda s: (-s[1], self.member_names[s[0]]))
+        return [(self.member_names[i], s) for i, s in ranked[:limit]]
+
+    def resolve(self, name):
+        """The normalised name of the member name refers to - None if no member is similar enough"""
+        member_id = self._variants.get(normalise_variant(name))
+        if member_id is None:
+            try:
+                member_id = self.get_id(normalise_member_name(name))
+            except MemberNameParseException:
+                pass
+        if member_id is not None:
+            return self.member_names[member_id]
+        matches = self.search(name, limit=1)
+        if matches and matches[0][1] >= MIN_SIMILARITY:
+            return matches[0][0]
+        return None
@@ -0,0 +1,104 @@
+from collections import namedtuple
+
+import pandas as pd
+
+
+class Query(namedtuple('Query', [
+        'filter', 'group_by', 'order_by', 'limit', 'columns', 'date_from', 'date_to', 'dedupe'])):
+
+    """
+    Immutable plan of a query of interests - filter descriptions and dates
+    (inclusive), remove repeated declarations, group and total amounts,
+    order (descending), limit and select columns.
+
+    Setting a part of the query returns a new query, so queries can be
+    composed without clobbering each other, and used as keys to memoise
+    their results:
+
+        query = Query().set_filter('shares').add_group_by('member_name')
+        query.set_order_by('amount').set_limit(10)
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, filter=None, group_by=(), order_by=None, limit=None, columns=None,
+                date_from=None, date_to=None, dedupe=False):
+        return super().__new__(
+            cls, filter, tuple(group_by), order_by, limit, tuple(columns) if columns else None,
+            cls._get_timestamp(date_from), cls._get_timestamp(date_to), dedupe
+        )
+
+    @staticmethod
+    def _get_timestamp(date):
+        return None if date is None else pd.Timestamp(date)
+
+    def set_filter(self, term):
+        return self._replace(filter=term)
+
+    def set_group_by(self, columns):
+        return self._replace(group_by=tuple(columns))
+
+    def add_group_by(self, column):
+        if column in self.group_by:
+            return self
+        return self._replace(group_by=self.group_by + (column,))
+
+    def set_order_by(self, column):
+        return self._replace(order_by=column)
+
+    def set_limit(self, limit):
+        return self._replace(limit=limit)
+
+    def set_date_range(self, date_from=None, date_to=None):
+        return self._replace(date_from=self._get_timestamp(date_from), date_to=self._get_timestamp(date_to))
+
+    @property
+    def has_date_range(self):
+        return self.date_from is not None or self.date_to is not None
+
+    def set_dedupe(self, dedupe=True):
+        return self._replace(dedupe=dedupe)
+
+    def set_columns(self, columns):
+        return self._replace(columns=tuple(columns) if columns else None)
+
+    @property
+    def can_stream(self):
+        # Whether the query can be answered a page of interests at a time -
+        # filters and date ranges select each interest on its own, but
+        # grouping, ordering, limits and deduping need every interest
+        return not (self.group_by or self.order_by or self.limit is not None or self.dedupe)
+
+    def get_totals(self):
+        # Total amounts of the filtered interests per type - grouped so
+        # unfiltered totals can be answered from the rollups
+        return Query(filter=self.filter, group_by=['type_code'], date_from=self.date_from,
+                     date_to=self.date_to, dedupe=self.dedupe)
+
+    def get_amounts(self, columns):
+        # Amounts of the filtered interests, with these columns
+        return Query(filter=self.filter, columns=list(columns) + ['amount'],
+                     date_from=self.date_from, date_to=self.date_to, dedupe=self.dedupe)
+
+    def can_use_rollups(self, rollup_keys):
+        # Whether the query can be answered by regrouping rollups
+        return (not self.filter and not self.has_date_range and not self.dedupe and
+                bool(self.group_by) and set(self.group_by) <= set(rollup_keys))
+
+    def reads_only(self, columns):
+        # Whether the query can be answered from just these columns - filters
+        # and deduping need the descriptions, and ungrouped queries the
+        # selected columns
+        if self.filter or self.dedupe:
+            return False
+        if self.group_by:
+            needed = set(self.group_by) | {'amount'}
+        elif self.columns:
+            needed = set(self.columns)
+        else:
+            return False
+        if self.order_by:
+            needed.add(self.order_by)
+        if self.has_date_range:
+            needed.add('date')
+        return needed <= set(columns)
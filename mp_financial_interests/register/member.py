@@ -29,16 +29,20 @@ class RegisterMemberPage(RegisterPage):
         self.url = url
         self.session = session
         self._interests = []
+        # Fingerprints of the errata applied while parsing the page
+        self.errata = []
+        # The member's name as it appears in the register
+        self.name_variants = []
         self._initilise_interest()
 
     def get_interests(self):
         self._parse_interest_entries()
         return self._interests
 
-    def _initilise_interest(self, interest_type_code=None):
+    def _initilise_interest(self, interest_type=None):
         self._interest = Interest(
             session=self.session,
-            type_code=interest_type_code
+            interest_type=interest_type
         )
 
     def _validate_and_commit_interest(self):
@@ -75,7 +79,7 @@ class RegisterMemberPage(RegisterPage):
         # Initialise an interest using them same interest type code
         # as preivous one - the interest type code is read once from the
         # title, so needs to persist between each interest
-        self._initilise_interest(self._interest.type_code)
+        self._initilise_interest(self._interest.interest_type)
 
     def _split_interest(self):
         lines = self._interest.lines
@@ -193,6 +197,7 @@ class RegisterMemberPage(RegisterPage):
         }
         erratum = errata.handle_error(**params)
         if erratum:
+            self.errata.append(erratum.fingerprint)
             if erratum.commit_interest:
                 self._commit_interest()
 
@@ -4,7 +4,7 @@ import re
 
 from mp_financial_interests.register.page import RegisterPage
 from mp_financial_interests.register.member import RegisterMemberPage
-from mp_financial_interests.lib.helpers import normalise_member_name
+from mp_financial_interests.lib.helpers import normalise_member_name, normalise_text
 
 
 class RegisterMembersPage(RegisterPage):
@@ -35,9 +35,14 @@ class RegisterMembersPage(RegisterPage):
             # Only include if there is an actual href to a webpage (.htm)
             if href and '.htm' in href and href not in ignore_hrefs:
                 member_name = normalise_member_name(a.text)
+                name_variants = members[member_name].name_variants if member_name in members else []
                 members[member_name] = RegisterMemberPage(
                     member_name, self.session, self.get_relative_url(href)
                 )
+                # Record each variant of the name as it appears in the register
+                variant = normalise_text(a.text).strip()
+                members[member_name].name_variants = name_variants + (
+                    [variant] if variant not in name_variants else [])
         return members
 
     def __repr__(self):
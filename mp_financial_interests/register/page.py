@@ -3,7 +3,11 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
 import requests
-import requests_cache
+
+from mp_financial_interests.cache import PageCache
+
+
+page_cache = PageCache()
 
 
 class RegisterPage:
@@ -14,12 +18,14 @@ class RegisterPage:
 
     @staticmethod
     def _get_soup(url):
-        _cache_key = '_cache'
-        requests_cache.install_cache(_cache_key)
-        r = requests.get(url)
-        r.raise_for_status()
+        try:
+            content = page_cache[url]
+        except KeyError:
+            r = requests.get(url)
+            r.raise_for_status()
+            content = page_cache[url] = r.content
         # Pages are often malformed, so use the more lenient html5lib parser
-        return BeautifulSoup(r.content, "html5lib")
+        return BeautifulSoup(content, "html5lib")
 
     def get_relative_url(self, path):
         # For a path, Get a URL relative to this page
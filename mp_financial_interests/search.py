@@ -0,0 +1,154 @@
+import os
+import re
+import glob
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+from mp_financial_interests.cache import CACHE_DIR
+from mp_financial_interests.lib.files import atomic_path
+
+
+logger = logging.getLogger()
+
+
+re_token = re.compile(r'\w+')
+
+# A filter containing any of these is treated as a regex
+re_regex_characters = re.compile(r'[\\^$.|?*+()\[\]{}]')
+
+# Number of persisted indexes to keep
+MAX_INDEXES = 8
+
+
+class DescriptionIndex:
+
+    """
+    Inverted index of the lowercased tokens in interest descriptions, mapping
+    each token to the positions of the rows containing it.
+
+    A filter matches descriptions containing it, case insensitively. Each word
+    in the filter must fall within a token of a matching description - so
+    only rows with such tokens are candidates, and only the candidates are
+    checked for the full filter. Filters which are true regexes fall back to
+    scanning every description.
+
+    Indexes are saved in the cache, keyed by a hash of the descriptions they
+    index: <index_dir>/<fingerprint>.npz
+    """
+
+    def __init__(self, vocabulary, offsets, postings, number_of_rows):
+        # Rows containing vocabulary[i] are postings[offsets[i]:offsets[i + 1]]
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+        self.number_of_rows = number_of_rows
+        self._token_positions = {t: i for i, t in enumerate(vocabulary)}
+
+    def __len__(self):
+        return self.number_of_rows
+
+    @classmethod
+    def build(cls, descriptions):
+        postings = {}
+        for row, description in enumerate(descriptions.fillna('').tolist()):
+            for token in set(re_token.findall(description.lower())):
+                postings.setdefault(token, []).append(row)
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[t]) for t in vocabulary])
+        rows = np.fromiter((r for t in vocabulary for r in postings[t]), dtype=np.int32, count=offsets[-1])
+        return cls(vocabulary, offsets, rows, len(descriptions))
+
+    @staticmethod
+    def get_fingerprint(descriptions):
+        sha1 = hashlib.sha1(re_token.pattern.encode('utf-8'))
+        sha1.update(pd.util.hash_pandas_object(descriptions, index=False, categorize=False).to_numpy().tobytes())
+        return sha1.hexdigest()
+
+    @classmethod
+    def load_or_build(cls, descriptions, index_dir=os.path.join(CACHE_DIR, 'indexes')):
+        path = os.path.join(index_dir, '{}.npz'.format(cls.get_fingerprint(descriptions)))
+        try:
+            index = cls.load(path)
+            os.utime(path)
+            return index
+        except FileNotFoundError:
+            logger.info("Building description index.")
+            index = cls.build(descriptions)
+            index.save(path)
+            cls._prune(index_dir)
+            return index
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(
+                arrays['vocabulary'].tolist(),
+                arrays['offsets'],
+                arrays['postings'],
+                int(arrays['number_of_rows'])
+            )
+
+    def save(self, path):
+        with atomic_path(path) as temp_path:
+            with open(temp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    vocabulary=np.array(self.vocabulary, dtype=str),
+                    offsets=self.offsets,
+                    postings=self.postings,
+                    number_of_rows=self.number_of_rows
+                )
+
+    @staticmethod
+    def _prune(index_dir):
+        # Remove the least recently used indexes
+        paths = sorted(glob.glob(os.path.join(index_dir, '*.npz')), key=os.path.getmtime, reverse=True)
+        for path in paths[MAX_INDEXES:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _get_token_positions(self, word, at_start, at_end):
+        # Positions of tokens which can contain the word - a word bounded by a
+        # non word character in the filter must start or end a token
+        if at_start and at_end:
+            position = self._token_positions.get(word)
+            return [] if position is None else [position]
+        if at_start:
+            return [i for i, t in enumerate(self.vocabulary) if t.startswith(word)]
+        if at_end:
+            return [i for i, t in enumerate(self.vocabulary) if t.endswith(word)]
+        return [i for i, t in enumerate(self.vocabulary) if word in t]
+
+    def get_candidates(self, term):
+        """Positions of rows which may contain term - None if every row may"""
+        if re_regex_characters.search(term):
+            return None
+        term = term.lower()
+        candidates = None
+        for m in re_token.finditer(term):
+            positions = self._get_token_positions(m.group(), m.start() > 0, m.end() < len(term))
+            rows = np.unique(np.concatenate(
+                [self.postings[self.offsets[i]:self.offsets[i + 1]] for i in positions] or [self.postings[:0]]
+            ))
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        return candidates
+
+    def search(self, descriptions, term):
+        """Boolean mask of the descriptions containing term, case insensitively"""
+        candidates = self.get_candidates(term)
+        if candidates is None:
+            return descriptions.str.contains(term, flags=re.IGNORECASE).to_numpy(dtype=bool)
+        mask = np.zeros(len(descriptions), dtype=bool)
+        if re_token.fullmatch(term):
+            # A single word is in every row with a token containing it
+            mask[candidates] = True
+        elif len(candidates):
+            mask[candidates] = descriptions.iloc[candidates].str.contains(
+                re.escape(term), flags=re.IGNORECASE).to_numpy(dtype=bool)
+        return mask
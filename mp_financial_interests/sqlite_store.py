@@ -0,0 +1,385 @@
+import os
+import json
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from mp_financial_interests.cache import CACHE_DIR
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.store import BaseStore, InterestsStore, ROLLUP_KEYS, get_rollups
+from mp_financial_interests.fingerprints import get_interest_ids
+from mp_financial_interests.members import Members
+
+
+class SQLiteStore(BaseStore):
+
+    """
+    Store of parsed interests in a SQLite database - an alternative to the
+    Parquet InterestsStore, for ad-hoc SQL analysis:
+
+        SELECT member_name, SUM(amount) / 100.0 FROM interests
+        WHERE session = '2014-15' GROUP BY member_name
+
+    Amounts are stored in pence. Totals per member, session and type are kept
+    up to date in the rollups table as pages are written. Descriptions are
+    full text indexed:
+
+        SELECT * FROM interests WHERE id IN (
+            SELECT rowid FROM interests_fts WHERE interests_fts MATCH 'shares'
+        )
+
+    Interests are keyed by their ids - see fingerprints.get_interest_ids.
+    Writing a page upserts its interests, and each write which adds,
+    changes or removes interests is given the next revision, recorded
+    against those interests and in the removed table. Consumers can sync
+    the changes since a revision:
+
+        SELECT * FROM interests WHERE revision > 41
+
+    Members are referenced by their id in the members table, which maps each
+    variant of their name seen in the register to the member:
+
+        SELECT * FROM interests WHERE member_id IN (
+            SELECT member_id FROM members WHERE variant = 'diane abbott'
+        )
+
+    The database is in WAL mode, so concurrent processes can read while
+    another writes.
+    """
+
+    # Bumped when the schema changes - older databases are recreated, and
+    # their pages parsed again
+    schema_version = 4
+
+    columns = InterestsStore.columns
+
+    extraction_columns = InterestsStore.extraction_columns
+
+    key_columns = InterestsStore.key_columns
+
+    rollup_columns = InterestsStore.rollup_columns
+
+    # Columns interests are commonly filtered, grouped or ordered by
+    indexed_columns = ['member_name', 'member_id', 'session', 'type_code', 'date', 'amount']
+
+    schema = [
+        '''CREATE TABLE IF NOT EXISTS interests (
+            id INTEGER PRIMARY KEY,
+            member_name TEXT NOT NULL,
+            member_id INTEGER NOT NULL,
+            title TEXT,
+            type_code INTEGER,
+            amount INTEGER NOT NULL DEFAULT 0,
+            date TEXT,
+            description TEXT,
+            session TEXT NOT NULL,
+            parent_length INTEGER NOT NULL DEFAULT 0,
+            position INTEGER NOT NULL,
+            revision INTEGER NOT NULL
+        )''',
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS interests_fts USING fts5(
+            description, content='interests', content_rowid='id'
+        )''',
+        # Keep the full text index in step with the interests
+        '''CREATE TRIGGER IF NOT EXISTS interests_insert AFTER INSERT ON interests BEGIN
+            INSERT INTO interests_fts (rowid, description) VALUES (new.id, new.description);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS interests_delete AFTER DELETE ON interests BEGIN
+            INSERT INTO interests_fts (interests_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS interests_update AFTER UPDATE OF description ON interests BEGIN
+            INSERT INTO interests_fts (interests_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+            INSERT INTO interests_fts (rowid, description) VALUES (new.id, new.description);
+        END''',
+        '''CREATE TABLE IF NOT EXISTS removed (
+            id INTEGER PRIMARY KEY,
+            member_name TEXT NOT NULL,
+            session TEXT NOT NULL,
+            revision INTEGER NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS members (
+            variant TEXT PRIMARY KEY,
+            member_id INTEGER NOT NULL,
+            member_name TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS revision (
+            revision INTEGER NOT NULL
+        )''',
+        'INSERT INTO revision SELECT 0 WHERE NOT EXISTS (SELECT * FROM revision)',
+        '''CREATE TABLE IF NOT EXISTS pages (
+            session TEXT NOT NULL,
+            member_name TEXT NOT NULL,
+            metadata TEXT NOT NULL,
+            PRIMARY KEY (session, member_name)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS rollups (
+            member_name TEXT NOT NULL,
+            session TEXT NOT NULL,
+            type_code INTEGER,
+            amount INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (session, member_name, type_code)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS manifests (
+            key TEXT PRIMARY KEY,
+            manifest TEXT NOT NULL
+        )''',
+    ] + [
+        'CREATE INDEX IF NOT EXISTS interests_{0} ON interests ({0})'.format(c)
+        for c in indexed_columns + ['revision']
+    ]
+
+    def __init__(self, path=os.path.join(CACHE_DIR, 'interests.sqlite')):
+        super().__init__()
+        self.path = path
+        self._created = False
+
+    def connect(self):
+        if not self._created:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=60)
+        if not self._created:
+            connection.execute('PRAGMA journal_mode=WAL')
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                if connection.execute('PRAGMA user_version').fetchone()[0] != self.schema_version:
+                    self._drop_tables(connection)
+                for statement in self.schema:
+                    connection.execute(statement)
+                connection.execute('PRAGMA user_version = {}'.format(self.schema_version))
+            self._created = True
+        return connection
+
+    @staticmethod
+    def _drop_tables(connection):
+        tables = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'interests_fts_%'"
+        ).fetchall()
+        for table, in tables:
+            connection.execute('DROP TABLE IF EXISTS {}'.format(table))
+
+    def write_page(self, session, member_name, dataframe, **metadata):
+        dataframe = self._with_parent_lengths(dataframe)
+        metadata.update(session=session, member_name=member_name)
+        member_id = self._get_member_id(member_name)
+        ids = get_interest_ids(dataframe, metadata.get('url'))
+        # Dates are stored as ISO strings, which sort chronologically
+        dates = dataframe['date'].dt.strftime('%Y-%m-%d').astype(object)
+        rows = [
+            (r.member_name, member_id, r.title, int(r.type_code), int(r.amount), None if pd.isna(d) else d, r.description,
+             r.session, int(r.parent_length), int(i), position)
+            for position, (r, d, i) in enumerate(zip(
+                dataframe[self.columns + self.extraction_columns].itertuples(index=False), dates, ids))
+        ]
+        rollups = [
+            (r.member_name, r.session, int(r.type_code), int(r.amount), int(r.count))
+            for r in get_rollups(dataframe).itertuples(index=False)
+        ]
+        columns = self.columns + self.extraction_columns + ['id', 'position']
+        updated_columns = [c for c in columns if c != 'id']
+        page = {'session': session, 'member_name': member_name}
+        with closing(self.connect()) as connection, connection:
+            # Upsert the page's interests in a single transaction, so readers
+            # see either the old or the new interests. Writers are serialised,
+            # so each write's revision is the next
+            connection.execute('BEGIN IMMEDIATE')
+            page['revision'] = connection.execute('SELECT revision FROM revision').fetchone()[0] + 1
+            connection.execute('CREATE TEMP TABLE page ({})'.format(', '.join(columns)))
+            connection.executemany(
+                'INSERT INTO page VALUES ({})'.format(', '.join('?' * len(columns))), rows)
+            changes = connection.total_changes
+            connection.execute(
+                'INSERT OR REPLACE INTO removed (id, member_name, session, revision) '
+                'SELECT id, member_name, session, :revision FROM interests '
+                'WHERE session = :session AND member_name = :member_name AND id NOT IN (SELECT id FROM page)',
+                page
+            )
+            connection.execute(
+                'DELETE FROM interests '
+                'WHERE session = :session AND member_name = :member_name AND id NOT IN (SELECT id FROM page)',
+                page
+            )
+            connection.execute('DELETE FROM removed WHERE id IN (SELECT id FROM page)')
+            # Only new interests, and those with changed columns, are written
+            connection.execute(
+                'INSERT INTO interests ({0}, revision) SELECT {0}, :revision FROM page WHERE true '
+                'ON CONFLICT (id) DO UPDATE SET {1}, revision = excluded.revision WHERE {2}'.format(
+                    ', '.join(columns),
+                    ', '.join('{0} = excluded.{0}'.format(c) for c in updated_columns),
+                    ' OR '.join('{0} IS NOT excluded.{0}'.format(c) for c in updated_columns)
+                ),
+                page
+            )
+            if connection.total_changes != changes:
+                connection.execute('UPDATE revision SET revision = :revision', page)
+            connection.execute('DROP TABLE page')
+            connection.execute(
+                'DELETE FROM rollups WHERE session = ? AND member_name = ?', (session, member_name))
+            connection.executemany(
+                'INSERT INTO rollups ({}) VALUES (?, ?, ?, ?, ?)'.format(', '.join(self.rollup_columns)),
+                rollups
+            )
+            connection.execute(
+                'INSERT OR REPLACE INTO pages (session, member_name, metadata) VALUES (?, ?, ?)',
+                (session, member_name, json.dumps(metadata))
+            )
+
+    def read_members(self):
+        """The member table, as Members"""
+        with closing(self.connect()) as connection:
+            return Members(pd.read_sql_query('SELECT {} FROM members'.format(', '.join(Members.columns)), connection))
+
+    def update_members(self, members):
+        """
+        Add members, as (normalised name, name variants) pairs, to the member
+        table - returning their ids
+        """
+        members = list(members)
+        with closing(self.connect()) as connection, connection:
+            connection.execute('BEGIN IMMEDIATE')
+            table = Members(pd.read_sql_query('SELECT {} FROM members'.format(', '.join(Members.columns)), connection))
+            if any([table.add(member_name, variants) for member_name, variants in members]):
+                connection.executemany(
+                    'INSERT OR IGNORE INTO members ({}) VALUES (?, ?, ?)'.format(', '.join(Members.columns)),
+                    table.to_dataframe().itertuples(index=False)
+                )
+        self._members = table
+        return [table.get_id(member_name) for member_name, _ in members]
+
+    def read_page_metadata(self, session, member_name):
+        with closing(self.connect()) as connection:
+            row = connection.execute(
+                'SELECT metadata FROM pages WHERE session = ? AND member_name = ?',
+                (session, member_name)
+            ).fetchone()
+        if not row:
+            raise KeyError((session, member_name))
+        return json.loads(row[0])
+
+    @property
+    def sessions(self):
+        with closing(self.connect()) as connection:
+            return [r[0] for r in connection.execute('SELECT DISTINCT session FROM pages ORDER BY session')]
+
+    @property
+    def revision(self):
+        """The store's latest revision - 0 if nothing has been written"""
+        with closing(self.connect()) as connection:
+            return connection.execute('SELECT revision FROM revision').fetchone()[0]
+
+    def read(self, pages=None, columns=None, sessions=None, member_names=None, type_codes=None, since=None):
+        """
+        Read interests from the store, as a DataFrame
+
+        @param pages: (session, member name) pairs to read - defaults to all
+        @param columns: columns to read - defaults to all but the parent lengths and keys
+        @param sessions: only read these sessions
+        @param member_names: only read these members
+        @param type_codes: only read interests with these type codes
+        @param since: only read interests added or changed after this revision
+        """
+        columns = columns or self.columns
+        dataframe = self._read_table(
+            'interests', columns, 'session, member_name, position', pages,
+            sessions=sessions, member_names=member_names, type_codes=type_codes, since=since
+        )
+        if not len(dataframe):
+            return InterestsBuilder(self.columns + self.extraction_columns + self.key_columns).dataframe[columns]
+        return InterestsBuilder.astype(dataframe)
+
+    def read_changes(self, since=0):
+        """
+        Interests added or changed after a revision, with their ids and
+        revisions, and the ids, members, sessions and revisions of those
+        removed since - as a pair of DataFrames
+        """
+        changed = self.read(columns=self.columns + self.key_columns, since=since)
+        removed_columns = ['id', 'member_name', 'session', 'revision']
+        removed = self._read_table('removed', removed_columns, 'revision, id', None, since=since)
+        if not len(removed):
+            return changed, InterestsBuilder(removed_columns).dataframe
+        return changed, InterestsBuilder.astype(removed)
+
+    def _read_table(self, table, columns, order_by, pages, **filters):
+        conditions = []
+        params = []
+        for column, values in [('session', filters.get('sessions')),
+                               ('member_name', filters.get('member_names')),
+                               ('type_code', filters.get('type_codes'))]:
+            if values:
+                conditions.append('{} IN ({})'.format(column, ', '.join('?' * len(values))))
+                params += list(values)
+        if filters.get('since') is not None:
+            conditions.append('revision > ?')
+            params.append(filters['since'])
+        with closing(self.connect()) as connection:
+            if pages is not None:
+                # Join against the selected pages, rather than a huge IN clause
+                connection.execute('CREATE TEMP TABLE selected_pages (session TEXT, member_name TEXT)')
+                connection.executemany('INSERT INTO selected_pages VALUES (?, ?)', pages)
+                conditions.append('(session, member_name) IN (SELECT session, member_name FROM selected_pages)')
+            return pd.read_sql_query(
+                'SELECT {} FROM {} {} ORDER BY {}'.format(
+                    ', '.join(columns),
+                    table,
+                    'WHERE ' + ' AND '.join(conditions) if conditions else '',
+                    order_by
+                ),
+                connection,
+                params=params
+            )
+
+    def read_rollups(self, pages=None, sessions=None, member_names=None):
+        """
+        Read the total amount and number of interests per member, session
+        and type, as a DataFrame - parameters as for read
+        """
+        dataframe = self._read_table(
+            'rollups', self.rollup_columns, ', '.join(ROLLUP_KEYS), pages,
+            sessions=sessions, member_names=member_names
+        )
+        if not len(dataframe):
+            return get_rollups(InterestsBuilder(self.columns).dataframe)
+        return InterestsBuilder.astype(dataframe)
+
+    def compact(self):
+        # Merge the full text index segments written by each page
+        with closing(self.connect()) as connection, connection:
+            connection.execute("INSERT INTO interests_fts (interests_fts) VALUES ('optimize')")
+
+    def query(self, sql, params=()):
+        """Run a read only SQL query against the store, returning a DataFrame"""
+        self.connect().close()
+        uri = 'file:{}?mode=ro'.format(os.path.abspath(self.path))
+        with closing(sqlite3.connect(uri, uri=True, timeout=60)) as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def write_manifest(self, key, **manifest):
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO manifests (key, manifest) VALUES (?, ?)', (key, json.dumps(manifest)))
+
+    def read_manifest(self, key):
+        with closing(self.connect()) as connection:
+            row = connection.execute('SELECT manifest FROM manifests WHERE key = ?', (key,)).fetchone()
+        if not row:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def remove_manifest(self, key):
+        with closing(self.connect()) as connection, connection:
+            connection.execute('DELETE FROM manifests WHERE key = ?', (key,))
+
+    def entries(self):
+        # Yield (key, metadata) for every manifest and member page in the store
+        with closing(self.connect()) as connection:
+            manifests = connection.execute('SELECT key, manifest FROM manifests ORDER BY key').fetchall()
+            pages = connection.execute(
+                'SELECT session, member_name, metadata FROM pages ORDER BY session, member_name').fetchall()
+        for key, manifest in manifests:
+            yield key, json.loads(manifest)
+        for session, member_name, metadata in pages:
+            yield 'session={}/{}'.format(session, self.get_member_key(member_name)), json.loads(metadata)
@@ -0,0 +1,552 @@
+import os
+import glob
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from mp_financial_interests.cache import CACHE_DIR, get_parser_fingerprint, get_amount_fingerprint
+from mp_financial_interests.amounts import extract_amounts, strip_parents, get_overridden_mask
+from mp_financial_interests.errata import errata
+from mp_financial_interests.erratum import AMOUNT_ERROR_CODE
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.fingerprints import get_interest_ids
+from mp_financial_interests.members import Members
+from mp_financial_interests.lib.files import atomic_path, file_lock
+
+
+logger = logging.getLogger()
+
+# Key the store's own metadata is saved under in each Parquet file
+METADATA_KEY = b'mp_financial_interests'
+
+
+def _dictionary():
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+# Parent length of interests written before parent lengths were stored
+UNKNOWN_PARENT_LENGTH = -1
+
+# Interests are rolled up into totals per member, session and type
+ROLLUP_KEYS = ['member_name', 'session', 'type_code']
+
+
+def get_rollups(dataframe):
+    """Total amount and number of interests per member, session and type"""
+    return dataframe.groupby(ROLLUP_KEYS, observed=True)['amount'].agg(
+        amount='sum', count='count').reset_index()
+
+
+class BaseStore:
+
+    """
+    Behaviour shared by the interests stores - which read and write
+    interests (read) and the member table (read_members, update_members)
+    """
+
+    # Columns required to total interests, and select them by date
+    totals_columns = ['member_name', 'session', 'type_code', 'amount', 'date']
+
+    def __init__(self):
+        # Member ids never change, so the member table is only reread to
+        # add members
+        self._members = None
+
+    @staticmethod
+    def get_member_key(member_name):
+        return member_name.replace(' ', '_').replace(',', '').replace('-', '_').lower()
+
+    def _get_member_id(self, member_name):
+        if self._members is None:
+            self._members = self.read_members()
+        member_id = self._members.get_id(member_name)
+        if member_id is None:
+            member_id, = self.update_members([(member_name, [])])
+        return member_id
+
+    def read_totals(self, pages=None, **kwargs):
+        # Fast path for totals - only reads amounts and the group keys
+        return self.read(pages, columns=self.totals_columns, **kwargs)
+
+    def reextract_amounts(self):
+        """
+        Re-extract the amounts of stored interests from their descriptions in
+        bulk, after a change to amount extraction - returns the changed
+        interests, with their previous amounts. Amounts in pounds.
+
+        Only pages written by the current parser are re-extracted. Those
+        with changed amounts or an earlier amount fingerprint are rewritten
+        and stamped with the current one - other pages, and the session
+        manifests, are left for the next ingest to parse again
+        """
+        parser_fingerprint, amount_fingerprint = get_parser_fingerprint(), get_amount_fingerprint()
+        pages = {
+            (metadata['session'], metadata['member_name']): metadata
+            for _, metadata in self.entries()
+            if 'member_name' in metadata and metadata.get('parser_fingerprint') == parser_fingerprint
+        }
+        df = self.read(pages=list(pages), columns=self.columns + self.extraction_columns)
+        keys = pd.MultiIndex.from_frame(df[['session', 'member_name']].astype(object))
+        # Pages written before parent lengths were stored are left to be
+        # parsed again
+        unknown = set(keys[df['parent_length'].to_numpy() == UNKNOWN_PARENT_LENGTH].unique())
+        if unknown:
+            logger.warning("%d pages need parsing again to re-extract their amounts.", len(unknown))
+            known = ~keys.isin(list(unknown))
+            df, keys = df[known].reset_index(drop=True), keys[known]
+            pages = {page: metadata for page, metadata in pages.items() if page not in unknown}
+        previous = df['amount'].to_numpy()
+        descriptions = strip_parents(df['description'], df['parent_length'])
+        amounts = extract_amounts(descriptions).fillna(0).to_numpy(dtype=np.int64)
+        # Amounts replaced by errata aren't in the descriptions, so are kept
+        overridden = get_overridden_mask(df, errata.get_errata(AMOUNT_ERROR_CODE)).to_numpy()
+        amounts = np.where(overridden, previous, amounts)
+        changed = amounts != previous
+        changed_pages = set(keys[changed].unique())
+
+        updated = df.assign(amount=amounts)
+        grouped = dict(list(updated.groupby(['session', 'member_name'], observed=True, sort=False)))
+        rewritten = 0
+        for (session, member_name), metadata in sorted(pages.items()):
+            if (session, member_name) not in changed_pages and \
+                    metadata.get('amount_fingerprint') == amount_fingerprint:
+                continue
+            metadata = {k: v for k, v in metadata.items() if k not in ['session', 'member_name']}
+            metadata['amount_fingerprint'] = amount_fingerprint
+            page = grouped.get((session, member_name), updated.iloc[:0])
+            self.write_page(session, member_name, page.reset_index(drop=True), **metadata)
+            rewritten += 1
+        if rewritten:
+            self.compact()
+        logger.info("Re-extracted amounts of %d interests on %d pages.", changed.sum(), len(changed_pages))
+        changes = df[changed].assign(previous_amount=previous[changed] / 100, amount=amounts[changed] / 100)
+        return changes[['member_name', 'session', 'title', 'date', 'previous_amount', 'amount', 'description']].reset_index(drop=True)
+
+    @staticmethod
+    def _with_parent_lengths(dataframe):
+        # Interests written without their parent lengths (e.g. loaded from
+        # an export) are taken to have no parent line
+        if 'parent_length' in dataframe:
+            return dataframe
+        return dataframe.assign(parent_length=0)
+
+
+class InterestsStore(BaseStore):
+
+    """
+    Columnar store of parsed interests - a Parquet file per member page,
+    partitioned by session:
+
+        <path>/session=2014-15/abbott_diane.parquet
+
+    Each file carries metadata (fingerprints, errata applied) in its footer,
+    so it can be checked without reading the interests.
+
+    Reading thousands of small files is slow, so once ingested each session's
+    pages are compacted into a single file, sorted by member:
+
+        <path>/compacted/session=2014-15.parquet
+
+    Compacting a session also writes its rollups - the total amount and number
+    of interests per member and type - so totals are read without reading the
+    interests:
+
+        <path>/rollups/session=2014-15.parquet
+
+    Writing a page upserts its interests, keyed by their ids - see
+    fingerprints.get_interest_ids. Each write which adds, changes or removes
+    interests is given the next revision of the store, recorded against
+    those interests, and removes the session's compacted and rollup files.
+    Rewriting a page unchanged keeps its revisions and compacted files.
+    Removed interests are recorded per session:
+
+        <path>/removed/session=2014-15.parquet
+
+    so consumers can sync the changes since a revision, rather than
+    rereading every interest - see read_changes.
+
+    Reads only open the files for the requested sessions, filter on member
+    and type code, and only read the requested columns.
+
+    What has been ingested (e.g. the members of a session) is recorded in
+    JSON manifests: <path>/manifests/<key>.json
+
+    Every member written is given an integer id in the member table, along
+    with the variants of their name seen in the register - see
+    members.Members: <path>/members.parquet
+
+    The store can be shared by concurrent processes. Every file is written to
+    a temporary file and renamed into place, so readers never block and never
+    see a partial file. Compacting a session and invalidating its compacted
+    file are serialised by a per-session lock: <path>/locks/session=2014-15.lock
+    """
+
+    schema = pa.schema([
+        ('member_name', _dictionary()),
+        ('member_id', pa.int32()),
+        ('title', _dictionary()),
+        ('type_code', pa.int8()),
+        ('amount', pa.int64()),
+        ('date', pa.timestamp('s')),
+        ('description', pa.string()),
+        ('session', _dictionary()),
+        ('parent_length', pa.int32()),
+        ('id', pa.int64()),
+        ('revision', pa.int64()),
+    ])
+
+    # Length of the parent line each description starts with, so amounts can
+    # be re-extracted from the interest's own lines - only read on request
+    extraction_columns = ['parent_length']
+
+    # Columns of the store's keys - only read on request
+    key_columns = ['id', 'revision']
+
+    columns = schema.names[:-len(extraction_columns + key_columns)]
+
+    removed_schema = pa.schema([
+        ('id', pa.int64()),
+        ('member_name', _dictionary()),
+        ('session', _dictionary()),
+        ('revision', pa.int64()),
+    ])
+
+    rollup_schema = pa.schema([
+        ('member_name', _dictionary()),
+        ('session', _dictionary()),
+        ('type_code', pa.int8()),
+        ('amount', pa.int64()),
+        ('count', pa.int64()),
+    ])
+
+    rollup_columns = rollup_schema.names
+
+    members_schema = pa.schema([
+        ('member_id', pa.int32()),
+        ('member_name', pa.string()),
+        ('variant', pa.string()),
+    ])
+
+    def __init__(self, path=os.path.join(CACHE_DIR, 'interests')):
+        super().__init__()
+        self.path = path
+
+    def _get_session_path(self, session):
+        return os.path.join(self.path, 'session={}'.format(session))
+
+    def _get_page_path(self, session, member_name):
+        return os.path.join(
+            self._get_session_path(session),
+            '{}.parquet'.format(self.get_member_key(member_name))
+        )
+
+    def _get_compacted_path(self, session):
+        return os.path.join(self.path, 'compacted', 'session={}.parquet'.format(session))
+
+    def _get_rollup_path(self, session):
+        return os.path.join(self.path, 'rollups', 'session={}.parquet'.format(session))
+
+    def _get_removed_path(self, session):
+        return os.path.join(self.path, 'removed', 'session={}.parquet'.format(session))
+
+    def _get_lock_path(self, session):
+        return os.path.join(self.path, 'locks', 'session={}.lock'.format(session))
+
+    def _get_members_path(self):
+        return os.path.join(self.path, 'members.parquet')
+
+    def _get_revision_path(self):
+        return os.path.join(self.path, 'revision')
+
+    def _get_manifest_path(self, key):
+        return os.path.join(self.path, 'manifests', '{}.json'.format(key))
+
+    def write_page(self, session, member_name, dataframe, **metadata):
+        dataframe = self._with_parent_lengths(dataframe)[self.columns + self.extraction_columns].assign(
+            member_id=self._get_member_id(member_name), id=get_interest_ids(dataframe, metadata.get('url')))
+        metadata.update(session=session, member_name=member_name)
+        path = self._get_page_path(session, member_name)
+        # Pages of a session are upserted under its lock, so concurrent writes
+        # and compactions see each other's revisions
+        with file_lock(self._get_lock_path(session)):
+            existing = self._read_page(path)
+            # Interests with the same id and columns are unchanged
+            revisions = dataframe.merge(
+                existing, how='left', on=list(dataframe.columns))['revision'].to_numpy()
+            removed = existing[~existing['id'].isin(dataframe['id'])]
+            changed = np.isnan(revisions).any() or len(removed)
+            if changed:
+                revision = self._next_revision()
+                revisions = np.where(np.isnan(revisions), revision, revisions)
+                self._write_removed(session, dataframe['id'], removed.assign(revision=revision))
+            table = pa.Table.from_pandas(
+                dataframe.assign(revision=revisions.astype(np.int64)), schema=self.schema, preserve_index=False
+            )
+            schema_metadata = dict(table.schema.metadata or {})
+            schema_metadata[METADATA_KEY] = json.dumps(metadata)
+            table = table.replace_schema_metadata(schema_metadata)
+            with atomic_path(path) as temp_path:
+                pq.write_table(table, temp_path)
+            # The session's compacted and rollup files no longer match its pages
+            if changed:
+                for compacted_path in [self._get_compacted_path(session), self._get_rollup_path(session)]:
+                    try:
+                        os.remove(compacted_path)
+                    except FileNotFoundError:
+                        pass
+
+    def read_members(self):
+        """The member table, as Members"""
+        try:
+            return Members(pq.read_table(self._get_members_path()).to_pandas())
+        except FileNotFoundError:
+            return Members()
+
+    def update_members(self, members):
+        """
+        Add members, as (normalised name, name variants) pairs, to the member
+        table - returning their ids
+        """
+        members = list(members)
+        with file_lock(os.path.join(self.path, 'locks', 'members.lock')):
+            table = self.read_members()
+            changed = [table.add(member_name, variants) for member_name, variants in members]
+            if any(changed):
+                with atomic_path(self._get_members_path()) as path:
+                    pq.write_table(pa.Table.from_pandas(
+                        table.to_dataframe(), schema=self.members_schema, preserve_index=False), path)
+        self._members = table
+        return [table.get_id(member_name) for member_name, _ in members]
+
+    def _read_page(self, path):
+        # The interests of a page, with their ids and revisions - pages
+        # written before interests had ids or parent lengths are treated as empty
+        try:
+            if set(self.extraction_columns + self.key_columns) <= set(pq.read_schema(path).names):
+                return InterestsBuilder.astype(self._read_table([path], self.schema.names, None).to_pandas())
+        except FileNotFoundError:
+            pass
+        return InterestsBuilder(self.schema.names).dataframe
+
+    def _next_revision(self):
+        with file_lock(self._get_revision_path() + '.lock'):
+            revision = self.revision + 1
+            with atomic_path(self._get_revision_path()) as path:
+                with open(path, 'w') as f:
+                    f.write(str(revision))
+        return revision
+
+    @property
+    def revision(self):
+        """The store's latest revision - 0 if nothing has been written"""
+        try:
+            with open(self._get_revision_path()) as f:
+                return int(f.read())
+        except FileNotFoundError:
+            return 0
+
+    def _write_removed(self, session, ids, removed):
+        # Record removed interests, forgetting any which have been re-added
+        path = self._get_removed_path(session)
+        columns = self.removed_schema.names
+        try:
+            previous = pq.read_table(path).to_pandas()
+        except FileNotFoundError:
+            previous = removed[columns].iloc[:0]
+        if not len(removed) and not previous['id'].isin(ids).any():
+            return
+        removed = pd.concat([previous[~previous['id'].isin(ids)], removed[columns]], ignore_index=True)
+        with atomic_path(path) as temp_path:
+            pq.write_table(pa.Table.from_pandas(
+                removed.astype({'member_name': str, 'session': str}),
+                schema=self.removed_schema, preserve_index=False
+            ), temp_path)
+
+    def read_page_metadata(self, session, member_name):
+        return self._read_metadata(self._get_page_path(session, member_name))
+
+    @staticmethod
+    def _read_metadata(path):
+        try:
+            schema = pq.read_schema(path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            raise KeyError(path)
+        return json.loads(schema.metadata[METADATA_KEY])
+
+    @property
+    def sessions(self):
+        return sorted(
+            os.path.basename(p).split('=', 1)[1]
+            for p in glob.glob(os.path.join(self.path, 'session=*'))
+        )
+
+    def _get_paths(self, session=None):
+        return sorted(glob.glob(os.path.join(
+            self._get_session_path(session) if session else os.path.join(self.path, 'session=*'),
+            '*.parquet'
+        )))
+
+    def _select(self, pages=None, sessions=None, member_names=None):
+        # The members to read for each session - None to read all members
+        if pages is not None:
+            selected = {}
+            for session, member_name in pages:
+                selected.setdefault(session, set()).add(member_name)
+        else:
+            selected = {session: None for session in self.sessions}
+        if sessions:
+            selected = {s: m for s, m in selected.items() if s in sessions}
+        if member_names:
+            selected = {
+                s: set(member_names) if m is None else m.intersection(member_names)
+                for s, m in selected.items()
+            }
+        return {s: m for s, m in selected.items() if m is None or m}
+
+    def read(self, pages=None, columns=None, sessions=None, member_names=None, type_codes=None, since=None):
+        """
+        Read interests from the store, as a DataFrame
+
+        @param pages: (session, member name) pairs to read - defaults to all
+        @param columns: columns to read - defaults to all but the parent lengths and keys
+        @param sessions: only read these sessions
+        @param member_names: only read these members
+        @param type_codes: only read interests with these type codes
+        @param since: only read interests added or changed after this revision
+        """
+        columns = columns or self.columns
+        type_filter = ds.field('type_code').isin(type_codes) if type_codes else None
+        if since is not None:
+            revision_filter = ds.field('revision') > since
+            type_filter = revision_filter if type_filter is None else type_filter & revision_filter
+        # A table per session, in session order - compacted or not
+        tables = []
+        for session, session_member_names in sorted(self._select(pages, sessions, member_names).items()):
+            expression = type_filter
+            if session_member_names is not None:
+                member_filter = ds.field('member_name').isin(sorted(session_member_names))
+                expression = member_filter if expression is None else expression & member_filter
+            try:
+                tables.append(self._read_table([self._get_compacted_path(session)], columns, expression))
+                continue
+            except FileNotFoundError:
+                # Not compacted, or invalidated by a concurrent write
+                pass
+            if session_member_names is None:
+                page_paths = self._get_paths(session)
+            else:
+                page_paths = [
+                    p for p in (self._get_page_path(session, m) for m in sorted(session_member_names))
+                    if os.path.exists(p)
+                ]
+            if page_paths:
+                tables.append(self._read_table(page_paths, columns, type_filter))
+        if not tables:
+            return InterestsBuilder(self.schema.names).dataframe[columns]
+        table = pa.concat_tables(tables)
+        if 'parent_length' in table.column_names:
+            table = table.set_column(
+                table.column_names.index('parent_length'), 'parent_length',
+                pc.fill_null(table['parent_length'], UNKNOWN_PARENT_LENGTH)
+            )
+        return InterestsBuilder.astype(table.to_pandas())
+
+    def read_changes(self, since=0):
+        """
+        Interests added or changed after a revision, with their ids and
+        revisions, and the ids, members, sessions and revisions of those
+        removed since - as a pair of DataFrames
+        """
+        changed = self.read(columns=self.columns + self.key_columns, since=since)
+        removed = []
+        for path in sorted(glob.glob(self._get_removed_path('*'))):
+            removed.append(self._read_table([path], None, ds.field('revision') > since, self.removed_schema))
+        if removed:
+            removed = InterestsBuilder.astype(pa.concat_tables(removed).to_pandas())
+        else:
+            removed = InterestsBuilder(self.removed_schema.names).dataframe
+        return changed, removed
+
+    def _read_table(self, paths, columns, expression, schema=None):
+        dataset = ds.dataset(paths, schema=schema or self.schema, format='parquet')
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def _is_compacted(self, session):
+        return os.path.exists(self._get_compacted_path(session)) and os.path.exists(self._get_rollup_path(session))
+
+    def compact(self):
+        # Compact the pages of any session without compacted and rollup files
+        for session in self.sessions:
+            if self._is_compacted(session):
+                continue
+            with file_lock(self._get_lock_path(session)):
+                # Another process may have compacted the session while we waited
+                if self._is_compacted(session):
+                    continue
+                # Pages are read in file name order, so each member's interests are
+                # contiguous and row group statistics prune reads of a member
+                table = self._read_table(self._get_paths(session), self.schema.names, None)
+                table = table.unify_dictionaries().combine_chunks()
+                with atomic_path(self._get_compacted_path(session)) as path:
+                    pq.write_table(table, path, row_group_size=2000)
+                rollups = pa.Table.from_pandas(
+                    get_rollups(table.select(self.totals_columns).to_pandas()),
+                    schema=self.rollup_schema, preserve_index=False
+                )
+                with atomic_path(self._get_rollup_path(session)) as path:
+                    pq.write_table(rollups, path)
+
+    def read_rollups(self, pages=None, sessions=None, member_names=None):
+        """
+        Read the total amount and number of interests per member, session
+        and type, as a DataFrame - parameters as for read
+        """
+        rollups = []
+        for session, session_member_names in sorted(self._select(pages, sessions, member_names).items()):
+            member_filter = None
+            if session_member_names is not None:
+                member_filter = ds.field('member_name').isin(sorted(session_member_names))
+            try:
+                rollups.append(self._read_table(
+                    [self._get_rollup_path(session)], self.rollup_columns, member_filter, self.rollup_schema
+                ).to_pandas())
+            except FileNotFoundError:
+                # Not compacted yet - roll up the session's pages
+                rollups.append(get_rollups(self.read(
+                    pages, self.totals_columns, [session], session_member_names)))
+        if not rollups:
+            return get_rollups(InterestsBuilder(self.columns).dataframe)
+        return InterestsBuilder.astype(pd.concat(rollups, ignore_index=True))
+
+    def write_manifest(self, key, **manifest):
+        with atomic_path(self._get_manifest_path(key)) as path:
+            with open(path, 'w') as f:
+                json.dump(manifest, f)
+
+    def read_manifest(self, key):
+        try:
+            with open(self._get_manifest_path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def remove_manifest(self, key):
+        try:
+            os.remove(self._get_manifest_path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        # Yield (key, metadata) for every manifest and member page in the store
+        for path in sorted(glob.glob(self._get_manifest_path('*'))):
+            key = os.path.splitext(os.path.basename(path))[0]
+            yield key, self.read_manifest(key)
+        for path in self._get_paths():
+            session_dir, file_name = os.path.split(os.path.relpath(path, self.path))
+            yield '{}/{}'.format(session_dir, os.path.splitext(file_name)[0]), self._read_metadata(path)
@@ -0,0 +1,145 @@
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+
+import pandas as pd
+
+from mp_financial_interests.amounts import currency_to_float, extract_amounts, get_overridden_mask
+from mp_financial_interests.erratum import AmountErratum
+from mp_financial_interests.interest import Interest
+from mp_financial_interests.interests import Interests
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.lib.formatters import pounds_to_pence
+from mp_financial_interests.store import InterestsStore
+from mp_financial_interests.tests.test_store import StubInterest
+
+
+StubLine = namedtuple('StubLine', ['text'])
+
+
+class TestCurrencyToFloat(unittest.TestCase):
+
+    def test_currency_formatter_can_handle_commas(self):
+        self.assertEqual(currency_to_float('£1,000'), 1000)
+
+    def test_currency_formatter_can_handle_decimals(self):
+        self.assertEqual(currency_to_float('£1,000.69'), 1000.69)
+
+    def test_currency_formatter_can_handle_multiple_decimals(self):
+        self.assertEqual(currency_to_float('£1.000.69'), 1000.69)
+
+
+class TestExtractAmounts(unittest.TestCase):
+
+    DESCRIPTIONS = [
+        '£1,000',
+        'Payment of £1.000.69 for a speech',
+        'Donation of £5-10,000',
+        'Payment of £45,001-£50,000',
+        '£0-5,000',
+        '£ 250.50. and £ 1,200-',
+        'Payment of £2.675',
+        'No amount',
+        '',
+    ]
+
+    def test_matches_interest_amounts(self):
+        amounts = extract_amounts(pd.Series(self.DESCRIPTIONS))
+        for description, amount in zip(self.DESCRIPTIONS, amounts):
+            interest = Interest('2015-16')
+            interest.add_line(StubLine(description))
+            expected = interest._parse_maximum_amount_from_lines()
+            self.assertEqual(None if pd.isna(amount) else amount,
+                             None if expected is None else pounds_to_pence(expected), description)
+
+    def test_unparseable_amounts(self):
+        self.assertTrue(extract_amounts(pd.Series(['£- and £100'])).isna().all())
+
+    def test_overridden_mask(self):
+        dataframe = pd.DataFrame({
+            'member_name': ['abbott, diane', 'abbott, diane', 'adams, nigel'],
+            'description': ['Payment of 150', 'Payment of 200', 'Payment of 150'],
+        })
+        errata = [
+            AmountErratum(member_name='ABBOTT, Diane', line='Payment of 150', replacement_amount=150),
+            AmountErratum(member_name='adams, nigel', line='Payment of 150'),
+        ]
+        self.assertEqual(list(get_overridden_mask(dataframe, errata)), [True, False, False])
+
+
+class TestReextractAmounts(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = InterestsStore(self.path)
+        builder = InterestsBuilder(Interests.columns)
+        for amount, description in [(1, 'Payment of £1,000'), (200, 'Payment of £200'), (None, 'Shares')]:
+            builder.add_interest('abbott, diane', StubInterest(
+                'Title', 1, amount, '1 May 2015', description, '2014-15'
+            ))
+        self.write_page('abbott, diane', builder.dataframe, errata=['a'])
+
+    def write_page(self, member_name, dataframe, **metadata):
+        # Written by the current parser, with earlier amount extraction
+        fingerprints = dict(Interests._get_fingerprints(), amount_fingerprint='old')
+        self.store.write_page('2014-15', member_name, dataframe, **dict(fingerprints, **metadata))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_reextract_amounts(self):
+        revision = self.store.revision
+        changes = self.store.reextract_amounts()
+        self.assertEqual(list(changes['previous_amount']), [1])
+        self.assertEqual(list(changes['amount']), [1000])
+        self.assertEqual(list(self.store.read()['amount']), [100000, 20000, 0])
+        self.assertEqual(self.store.read_page_metadata('2014-15', 'abbott, diane')['errata'], ['a'])
+        self.assertEqual(self.store.revision, revision + 1)
+        # Nothing changes when amounts are re-extracted again
+        self.assertEqual(len(self.store.reextract_amounts()), 0)
+        self.assertEqual(self.store.revision, revision + 1)
+
+    def test_reextracted_pages_are_fresh(self):
+        self.assertEqual(self.get_stale_reason('abbott, diane'), 'amount extraction changed')
+        self.store.reextract_amounts()
+        self.assertIsNone(self.get_stale_reason('abbott, diane'))
+
+    def test_unchanged_pages_are_fresh(self):
+        builder = InterestsBuilder(Interests.columns)
+        builder.add_interest('adams, nigel', StubInterest('Title', 1, 100, '1 May 2015', 'Speech, £100', '2014-15'))
+        self.write_page('adams, nigel', builder.dataframe)
+        self.store.reextract_amounts()
+        self.assertIsNone(self.get_stale_reason('adams, nigel'))
+
+    def test_pages_from_other_parsers_are_left(self):
+        builder = InterestsBuilder(Interests.columns)
+        builder.add_interest('adams, nigel', StubInterest('Title', 1, 1, '1 May 2015', 'Speech, £100', '2014-15'))
+        self.write_page('adams, nigel', builder.dataframe, parser_fingerprint='old')
+        changes = self.store.reextract_amounts()
+        self.assertNotIn('adams, nigel', list(changes['member_name']))
+        self.assertEqual(list(self.store.read(member_names=['adams, nigel'])['amount']), [100])
+        self.assertEqual(self.get_stale_reason('adams, nigel'), 'parser changed')
+
+    def test_manifests_are_left(self):
+        manifest = dict(Interests._get_fingerprints(), members=[], amount_fingerprint='old')
+        self.store.write_manifest('session_2014-15', **manifest)
+        self.store.reextract_amounts()
+        self.assertEqual(self.store.read_manifest('session_2014-15'), manifest)
+
+    def get_stale_reason(self, member_name):
+        return Interests._get_stale_reason(self.store.read_page_metadata('2014-15', member_name))
+
+    def test_parent_amounts_are_ignored(self):
+        parent = 'Payments totalling £5,000: '
+        builder = InterestsBuilder(Interests.columns)
+        builder.add_interest('adams, nigel', StubInterest(
+            'Title', 1, 100, '1 May 2015', parent + 'Speech, £100', '2014-15'
+        ))
+        self.write_page('adams, nigel', builder.dataframe.assign(parent_length=len(parent)))
+        changes = self.store.reextract_amounts()
+        self.assertNotIn('adams, nigel', list(changes['member_name']))
+
+
+if __name__ == '__main__':
+    unittest.main()
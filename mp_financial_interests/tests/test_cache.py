@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+from multiprocessing import Pool
+
+from mp_financial_interests.cache import PageCache, get_parser_fingerprint
+
+
+class FixedFingerprintPageCache(PageCache):
+
+    fingerprint = 'a'
+
+
+def _write_and_read_page(args):
+    # Repeatedly write a page while reading it - every read must be a whole page
+    cache_dir, url, worker = args
+    page_cache = FixedFingerprintPageCache(cache_dir)
+    contents = set()
+    for i in range(50):
+        page_cache[url] = '<html>{}</html>'.format(worker).encode() * 1000
+        contents.add(page_cache[url])
+    return contents
+
+
+class TestCache(unittest.TestCase):
+
+    URL = 'https://publications.parliament.uk/pa/cm/cmregmem/180305/abbott_diane.htm'
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.page_cache = FixedFingerprintPageCache(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_page_is_cached(self):
+        self.page_cache[self.URL] = b'<html></html>'
+        self.assertEqual(self.page_cache[self.URL], b'<html></html>')
+        self.assertEqual(self.page_cache.status(), (1, 0))
+
+    def test_missing_page_raises_key_error(self):
+        with self.assertRaises(KeyError):
+            self.page_cache[self.URL]
+
+    def test_page_fetched_with_other_code_is_stale(self):
+        self.page_cache[self.URL] = b'<html></html>'
+        self.page_cache.fingerprint = 'b'
+        with self.assertRaises(KeyError):
+            self.page_cache[self.URL]
+        self.assertEqual(self.page_cache.status(), (0, 1))
+        # Fetching the page again replaces the stale copy
+        self.page_cache[self.URL] = b'<html>updated</html>'
+        self.assertEqual(self.page_cache.status(), (1, 0))
+        self.assertEqual(os.listdir(self.cache_dir), ['b'])
+
+    def test_concurrent_writers_and_readers(self):
+        with Pool(8) as pool:
+            results = pool.map(_write_and_read_page, [(self.cache_dir, self.URL, w) for w in range(8)])
+        pages = {'<html>{}</html>'.format(w).encode() * 1000 for w in range(8)}
+        for contents in results:
+            self.assertTrue(contents.issubset(pages))
+        self.assertIn(self.page_cache[self.URL], pages)
+        # No temporary files are left behind
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, 'a')), [os.path.basename(
+            self.page_cache._get_path(self.URL))])
+
+    def test_parser_fingerprint_is_stable(self):
+        self.assertEqual(get_parser_fingerprint(), get_parser_fingerprint())
+
+
+if __name__ == '__main__':
+    unittest.main()
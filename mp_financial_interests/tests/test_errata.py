@@ -0,0 +1,76 @@
+import unittest
+
+from mp_financial_interests.errata import Errata, errata
+from mp_financial_interests.erratum import AmountErratum, ParentLineErratum, AMOUNT_ERROR_CODE, PARENT_LINE_ERROR_CODE
+
+
+class TestErrata(unittest.TestCase):
+
+    FILTERS = {
+        'member_name': 'abbott, diane',
+        'session': '2014-15',
+        'type_code': 2,
+        'line': 'Some line.'
+    }
+
+    def setUp(self):
+        self.member_erratum = AmountErratum(member_name='ABBOTT, Diane')
+        self.line_erratum = AmountErratum(member_name='ABBOTT, Diane', line='Some line.')
+        self.session_erratum = AmountErratum(session='2014-15', type_code=2)
+        self.errata = Errata([self.line_erratum, self.member_erratum, self.session_erratum])
+
+    def _get_erratum(self, error_code=AMOUNT_ERROR_CODE, **filters):
+        params = dict(self.FILTERS)
+        params.update(filters)
+        return self.errata.get_erratum(error_code, params)
+
+    def test_earliest_registered_erratum_is_matched(self):
+        self.assertIs(self._get_erratum(), self.line_erratum)
+
+    def test_wildcard_fields_match_any_value(self):
+        self.assertIs(self._get_erratum(line='Another line.'), self.member_erratum)
+        self.assertIs(self._get_erratum(member_name='adams, nigel'), self.session_erratum)
+
+    def test_no_match(self):
+        self.assertIsNone(self._get_erratum(member_name='adams, nigel', type_code=3))
+        self.assertIsNone(self._get_erratum(error_code=PARENT_LINE_ERROR_CODE))
+
+    def test_erratum_can_filter_on_none(self):
+        erratum = ParentLineErratum(member_name='ABBOTT, Diane', type_code=None)
+        errata = Errata([erratum])
+        params = dict(self.FILTERS, type_code=None)
+        self.assertIs(errata.get_erratum(PARENT_LINE_ERROR_CODE, params), erratum)
+        self.assertIsNone(errata.get_erratum(PARENT_LINE_ERROR_CODE, self.FILTERS))
+
+    def test_member_fingerprint_changes_with_member_errata(self):
+        fingerprint = self.errata.get_member_fingerprint('abbott, diane', '2014-15')
+        other_fingerprint = self.errata.get_member_fingerprint('adams, nigel', '2013-14')
+        self.errata.add_erratum(AmountErratum(member_name='ABBOTT, Diane', session='2014-15'))
+        self.assertNotEqual(self.errata.get_member_fingerprint('abbott, diane', '2014-15'), fingerprint)
+        self.assertEqual(self.errata.get_member_fingerprint('adams, nigel', '2013-14'), other_fingerprint)
+
+    def test_member_errata_include_wildcard_errata(self):
+        self.assertEqual(self.errata.get_member_errata('adams, nigel', '2014-15'), [self.session_erratum])
+        self.assertEqual(self.errata.get_member_errata('abbott, diane', '2013-14'),
+                         [self.line_erratum, self.member_erratum])
+
+    def test_erratum_fingerprint_changes_when_edited(self):
+        erratum = AmountErratum(member_name='ABBOTT, Diane', replacement_amount=100)
+        edited_erratum = AmountErratum(member_name='ABBOTT, Diane', replacement_amount=200)
+        self.assertEqual(erratum.fingerprint, AmountErratum(member_name='abbott, diane', replacement_amount=100).fingerprint)
+        self.assertNotEqual(erratum.fingerprint, edited_erratum.fingerprint)
+
+    def test_index_matches_linear_scan(self):
+        # Every registered erratum should resolve to the same erratum a
+        # linear subset scan of the errata table would return
+        all_errata = [e for code in errata._errata.values() for e in code]
+        for erratum in all_errata:
+            filters = dict(self.FILTERS, **dict(erratum.filter_on))
+            filters_set = set(filters.items())
+            expected = next(e for e in errata._errata[erratum.error_code]
+                            if e.filter_on.issubset(filters_set))
+            self.assertIs(errata.get_erratum(erratum.error_code, filters), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+
+from mp_financial_interests.exports import (
+    write_feather, read_feather, open_writer, pence_to_pounds, pence_to_decimals, CSVWriter, JSONLinesWriter
+)
+from mp_financial_interests.interests import Interests
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.tests.test_store import StubInterest
+
+
+class TestFeather(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.path, 'mps.arrow')
+        builder = InterestsBuilder(Interests.columns)
+        for member_name, amount, description in [
+                ('abbott, diane', 100, 'Shares in a company'), ('adams, nigel', 250.5, 'Speech')]:
+            builder.add_interest(member_name, StubInterest(
+                'Title', 1, amount, '1 May 2015', description, '2014-15'
+            ))
+        self.dataframe = builder.dataframe
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_round_trip(self):
+        write_feather(self.dataframe, self.file_name)
+        dataframe = read_feather(self.file_name)
+        self.assertTrue(dataframe.equals(self.dataframe))
+        self.assertEqual(list(dataframe.dtypes), list(self.dataframe.dtypes))
+
+    def test_strings_are_dictionary_encoded(self):
+        write_feather(self.dataframe, self.file_name)
+        with pa.memory_map(self.file_name) as source:
+            schema = pa.ipc.open_file(source).schema
+        for column in InterestsBuilder.categorical_columns:
+            self.assertTrue(pa.types.is_dictionary(schema.field(column).type), column)
+
+    def test_interests_from_feather(self):
+        Interests(dataframe=self.dataframe).to_feather(self.file_name)
+        interests = Interests.from_feather(self.file_name)
+        self.assertEqual(str(interests.total), '350.50')
+        interests.set_filter('shares')
+        self.assertEqual(list(interests.data['member_name']), ['abbott, diane'])
+
+
+class TestFormatters(unittest.TestCase):
+
+    def test_pence_to_pounds(self):
+        self.assertEqual(pence_to_pounds(2068537), Decimal('20685.37'))
+
+    def test_pence_to_decimals(self):
+        self.assertEqual(list(pence_to_decimals(pd.Series([100069, 5, -250]))), ['1000.69', '0.05', '-2.50'])
+
+
+class TestWriters(unittest.TestCase):
+
+    def setUp(self):
+        builder = InterestsBuilder(Interests.columns)
+        builder.add_interest('abbott, diane', StubInterest('Title', 1, 1000.69, '1 May 2015', '£1,000.69 fee', '2014-15'))
+        self.dataframe = builder.dataframe
+
+    def test_csv_header_is_written_once(self):
+        output = io.StringIO()
+        writer = CSVWriter(output)
+        writer.write(self.dataframe)
+        writer.write(self.dataframe)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1], lines[2])
+        self.assertIn(',1000.69,2015-05-01,', lines[1])
+
+    def test_json_lines(self):
+        output = io.StringIO()
+        writer = JSONLinesWriter(output)
+        writer.write(self.dataframe)
+        writer.write(self.dataframe.iloc[:0])
+        rows = [json.loads(l) for l in output.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['amount'], 1000.69)
+        self.assertEqual(rows[0]['date'], '2015-05-01T00:00:00')
+        self.assertEqual(rows[0]['description'], '£1,000.69 fee')
+
+    def test_open_writer_gzips(self):
+        path = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(path, 'mps.jsonl.gz')
+            with open_writer('jsonl', file_name) as writer:
+                writer.write(self.dataframe)
+            with gzip.open(file_name, 'rt', encoding='utf-8') as f:
+                self.assertEqual(json.loads(f.readline())['member_name'], 'abbott, diane')
+        finally:
+            shutil.rmtree(path)
+
+    def test_export_interests_from_feather(self):
+        path = tempfile.mkdtemp()
+        try:
+            Interests(dataframe=self.dataframe).to_feather(os.path.join(path, 'mps.arrow'))
+            interests = Interests.from_feather(os.path.join(path, 'mps.arrow'))
+            targets = [('csv', os.path.join(path, 'mps.csv')), ('feather', os.path.join(path, 'copy.arrow'))]
+            interests.export(targets)
+            with open(targets[0][1], encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), 2)
+            self.assertIn(',1000.69,2015-05-01,', lines[1])
+            self.assertEqual(list(read_feather(targets[1][1])['amount']), [100069])
+        finally:
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+import pandas as pd
+
+from mp_financial_interests.fingerprints import DIFF_COLUMNS, get_interest_fingerprints, get_interest_ids, diff_interests
+
+
+class TestFingerprints(unittest.TestCase):
+
+    def _get_dataframe(self, **columns):
+        interest = {
+            'member_name': 'abbott, diane', 'title': 'Gifts', 'date': pd.Timestamp('2015-05-01'),
+            'amount': 10000, 'description': 'Shares in Acme', 'session': '2014-15'
+        }
+        interest.update(columns)
+        return pd.DataFrame([interest])
+
+    def _get_fingerprint(self, **columns):
+        return get_interest_fingerprints(self._get_dataframe(**columns)).iloc[0]
+
+    def test_repeats_share_a_fingerprint(self):
+        fingerprint = self._get_fingerprint()
+        self.assertEqual(self._get_fingerprint(session='2015-16'), fingerprint)
+        self.assertEqual(self._get_fingerprint(description='  shares in\nACME '), fingerprint)
+        self.assertEqual(self._get_fingerprint(title='GIFTS'), fingerprint)
+
+    def test_changes_change_the_fingerprint(self):
+        fingerprint = self._get_fingerprint()
+        self.assertNotEqual(self._get_fingerprint(amount=20000), fingerprint)
+        self.assertNotEqual(self._get_fingerprint(date=pd.NaT), fingerprint)
+        self.assertNotEqual(self._get_fingerprint(member_name='adams, nigel'), fingerprint)
+        self.assertNotEqual(self._get_fingerprint(description='Shares in Acme Ltd'), fingerprint)
+
+    def test_fingerprint_columns(self):
+        dataframe = pd.concat([self._get_dataframe(), self._get_dataframe(amount=20000)])
+        fingerprints = get_interest_fingerprints(dataframe, ['member_name', 'title', 'description'])
+        self.assertEqual(fingerprints.iloc[0], fingerprints.iloc[1])
+
+    def test_ids(self):
+        dataframe = pd.concat([self._get_dataframe(amount=20000), self._get_dataframe(), self._get_dataframe()])
+        ids = get_interest_ids(dataframe, 'http://example.com/abbott.htm')
+        self.assertEqual(ids.dtype, 'int64')
+        self.assertEqual(len(set(ids)), 3)
+        # Ids don't depend on the other interests on the page
+        self.assertEqual(list(get_interest_ids(dataframe.iloc[1:], 'http://example.com/abbott.htm')), list(ids[1:]))
+        self.assertNotEqual(get_interest_ids(dataframe, 'http://example.com/adams.htm')[0], ids[0])
+
+
+class TestDiff(unittest.TestCase):
+
+    def _get_dataframe(self, interests):
+        return pd.DataFrame([{
+            'member_name': member_name, 'title': 'Gifts', 'date': pd.Timestamp(date),
+            'amount': amount, 'description': description
+        } for member_name, date, amount, description in interests])
+
+    def test_diff(self):
+        old = self._get_dataframe([
+            ('abbott, diane', '2015-05-01', 100, 'Shares in Acme'),
+            ('abbott, diane', '2015-05-01', 100, 'Shares in Acme'),
+            ('abbott, diane', '2015-06-01', 200, 'Speech to Acme'),
+            ('adams, nigel', '2015-05-01', 300, 'Flights'),
+            ('adams, nigel', '2015-05-02', 400, 'Hotel'),
+        ])
+        new = self._get_dataframe([
+            ('abbott, diane', '2015-05-01', 100, 'shares in  acme'),
+            ('abbott, diane', '2015-07-01', 250, 'Speech to Acme'),
+            ('adams, nigel', '2015-05-01', 300, 'Return flights'),
+            ('baker, norman', '2015-05-01', 500, 'Tickets'),
+        ])
+        diff = diff_interests(old, new)
+        self.assertEqual(list(diff.columns), DIFF_COLUMNS)
+        self.assertEqual(list(zip(diff['member_name'], diff['change'])), [
+            ('abbott, diane', 'changed'),
+            ('abbott, diane', 'removed'),
+            ('adams, nigel', 'changed'),
+            ('adams, nigel', 'removed'),
+            ('baker, norman', 'added'),
+        ])
+        amount_change, description_change = diff.iloc[0], diff.iloc[2]
+        self.assertEqual((amount_change['amount'], amount_change['previous_amount']), (250, 200))
+        self.assertEqual(amount_change['previous_date'], pd.Timestamp('2015-06-01'))
+        self.assertTrue(pd.isna(amount_change['previous_description']))
+        self.assertEqual(description_change['previous_description'], 'Flights')
+        self.assertTrue(pd.isna(description_change['previous_amount']))
+        self.assertEqual(diff.iloc[3]['description'], 'Hotel')
+
+    def test_no_changes(self):
+        dataframe = self._get_dataframe([('abbott, diane', '2015-05-01', 100, 'Shares in Acme')])
+        self.assertEqual(len(diff_interests(dataframe, dataframe)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,21 +1,23 @@
 import datetime
 import unittest
-from mp_financial_interests.lib.formatters import currency_to_float
 
+from mp_financial_interests.lib.formatters import pounds_to_pence, parse_date
 
-class TestRegisterIndex(unittest.TestCase):
 
-    def test_currency_formatter_can_handle_commas(self):
-        self._format_currency('£1,000', 1000)
+class TestRegisterIndex(unittest.TestCase):
 
-    def test_currency_formatter_can_handle_decimals(self):
-        self._format_currency('£1,000.69', 1000.69)
+    def test_pounds_to_pence_is_exact(self):
+        self.assertEqual(pounds_to_pence(1000.69), 100069)
+        self.assertEqual(pounds_to_pence(0.1 + 0.2), 30)
 
-    def test_currency_formatter_can_handle_multiple_decimals(self):
-        self._format_currency('£1.000.69', 1000.69)
+    def test_parse_date(self):
+        self.assertEqual(parse_date('4 October 2012'), datetime.date(2012, 10, 4))
+        self.assertEqual(parse_date('30 june2011'), datetime.date(2011, 6, 30))
+        self.assertEqual(parse_date('4 Oct 2012'), datetime.date(2012, 10, 4))
 
-    def _format_currency(self, currency, expected_float):
-        self.assertEqual(currency_to_float(currency), expected_float)
+    def test_parse_date_returns_none_for_invalid_dates(self):
+        self.assertIsNone(parse_date('31 Febuary 2012'))
+        self.assertIsNone(parse_date('Registered'))
 
 
 if __name__ == '__main__':
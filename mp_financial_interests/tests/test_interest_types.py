@@ -0,0 +1,36 @@
+import unittest
+
+from mp_financial_interests.interest import Interest
+from mp_financial_interests.interest_types import interest_types, get_interest_type, get_code_of_conduct_era
+
+
+SESSIONS = ['2010-12', '2012-13', '2013-14', '2014-15', '2015-16', '2016-17', '2017-19']
+
+
+class TestInterestTypes(unittest.TestCase):
+
+    def test_code_of_conduct_era(self):
+        self.assertEqual(get_code_of_conduct_era('2014-15'), 2010)
+        self.assertEqual(get_code_of_conduct_era('2015-16'), 2015)
+        self.assertIsNone(get_code_of_conduct_era('2009-10'))
+
+    def test_resolution_table_matches_interest_types(self):
+        for session in SESSIONS:
+            for type_code in range(1, 12):
+                expected = next((t for t in interest_types
+                                 if t.type_code == type_code and t.is_code_of_conduct_for(session)), None)
+                try:
+                    interest_type = get_interest_type(session, type_code)
+                except KeyError:
+                    interest_type = None
+                self.assertIs(interest_type, expected)
+
+    def test_interest_shares_interest_type(self):
+        interest = Interest('2016-17', type_code=1)
+        next_interest = Interest('2016-17', interest_type=interest.interest_type)
+        self.assertIs(next_interest.interest_type, interest.interest_type)
+        self.assertEqual(next_interest.title, 'Employment and earnings')
+
+
+if __name__ == '__main__':
+    unittest.main()
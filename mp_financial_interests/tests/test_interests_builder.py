@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from mp_financial_interests.interests import Interests
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.tests.test_store import StubInterest
+
+
+class TestInterestsBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.builder = InterestsBuilder(Interests.columns)
+
+    def _add_interest(self, amount=1000.5, type_code=1):
+        self.builder.add_interest('abbott, diane', StubInterest(
+            'Employment and earnings', type_code, amount, '4 October 2016', 'Description', '2016-17'
+        ))
+
+    def test_columns_are_typed(self):
+        self._add_interest()
+        dataframe = self.builder.dataframe
+        self.assertEqual(list(dataframe.columns), Interests.columns)
+        self.assertEqual(dataframe['amount'].dtype, np.int64)
+        self.assertEqual(dataframe['type_code'].dtype, np.int8)
+        self.assertEqual(dataframe['member_name'].dtype, 'category')
+
+    def test_amount_is_stored_in_pence(self):
+        self._add_interest(amount=1000.69)
+        self.assertEqual(self.builder.dataframe['amount'][0], 100069)
+
+    def test_missing_amount_is_zero(self):
+        self._add_interest(amount=None)
+        self.assertEqual(self.builder.dataframe['amount'][0], 0)
+
+    def test_batches_are_combined(self):
+        for i in range(3):
+            self._add_interest(amount=i)
+            self.builder.flush()
+        self._add_interest(amount=3)
+        self.assertEqual(len(self.builder), 4)
+        self.assertEqual(list(self.builder.dataframe['amount']), [0, 100, 200, 300])
+        self.assertEqual(list(self.builder.dataframe.index), [0, 1, 2, 3])
+
+    def test_batches_with_different_categories_stay_categorical(self):
+        self._add_interest()
+        self.builder.flush()
+        self.builder.add_interest('adams, nigel', StubInterest(
+            'Clients', 3, 100, '4 October 2012', 'Description', '2012-13'
+        ))
+        dataframe = self.builder.dataframe
+        self.assertEqual(dataframe['member_name'].dtype, 'category')
+        self.assertEqual(list(dataframe['session']), ['2016-17', '2012-13'])
+
+    def test_empty(self):
+        self.assertEqual(len(self.builder.dataframe), 0)
+        self.assertEqual(list(self.builder.dataframe.columns), Interests.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
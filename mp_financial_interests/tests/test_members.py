@@ -0,0 +1,45 @@
+import unittest
+
+from mp_financial_interests.members import Members
+
+
+class TestMembers(unittest.TestCase):
+
+    def setUp(self):
+        self.members = Members()
+        self.members.add('abbott, diane', ['ABBOTT, Ms Diane'])
+        self.members.add('adams, nigel', ['ADAMS, Nigel'])
+        self.members.add('abrahams, debbie', ['ABRAHAMS, Debbie'])
+
+    def test_ids(self):
+        self.assertEqual(self.members.get_id('abbott, diane'), 1)
+        self.assertEqual(self.members.get_id('abrahams, debbie'), 3)
+        self.assertIsNone(self.members.get_id('baker, norman'))
+        self.assertFalse(self.members.add('adams, nigel', ['Adams,  NIGEL']))
+        self.assertTrue(self.members.add('adams, nigel', ['Mr Nigel Adams']))
+        self.assertEqual(self.members.get_id('adams, nigel'), 2)
+
+    def test_round_trip(self):
+        members = Members(self.members.to_dataframe())
+        self.assertEqual(members.member_names, self.members.member_names)
+        self.assertEqual(members.resolve('abbott, ms diane'), 'abbott, diane')
+        self.assertTrue(members.add('baker, norman'))
+        self.assertEqual(members.get_id('baker, norman'), 4)
+
+    def test_resolve(self):
+        self.assertEqual(self.members.resolve('ABBOTT, Ms Diane'), 'abbott, diane')
+        self.assertEqual(self.members.resolve('Abbott, Diane'), 'abbott, diane')
+        self.assertEqual(self.members.resolve('Diane Abbot'), 'abbott, diane')
+        self.assertEqual(self.members.resolve('Nigel Adams'), 'adams, nigel')
+        self.assertEqual(self.members.resolve('Debbie Abrahms'), 'abrahams, debbie')
+        self.assertIsNone(self.members.resolve('Norman Baker'))
+
+    def test_search(self):
+        matches = self.members.search('abbott', limit=2)
+        self.assertEqual(matches[0][0], 'abbott, diane')
+        self.assertEqual(len(matches), 2)
+        self.assertGreater(matches[0][1], matches[1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+import io
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from mp_financial_interests.cache import get_parser_fingerprint, get_amount_fingerprint, get_errata_fingerprint
+from mp_financial_interests.exports import CSVWriter
+from mp_financial_interests.interests import Interests
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.query import Query
+from mp_financial_interests.search import DescriptionIndex
+from mp_financial_interests.store import InterestsStore, ROLLUP_KEYS
+from mp_financial_interests.tests.test_store import StubInterest
+
+
+class TestQuery(unittest.TestCase):
+
+    def test_query_is_immutable(self):
+        query = Query()
+        grouped = query.add_group_by('member_name').add_group_by('session').add_group_by('member_name')
+        self.assertEqual(query.group_by, ())
+        self.assertEqual(grouped.group_by, ('member_name', 'session'))
+        self.assertEqual(grouped.set_filter('shares').filter, 'shares')
+        self.assertIsNone(grouped.filter)
+
+    def test_equal_queries_share_a_key(self):
+        self.assertEqual(
+            hash(Query().set_filter('shares').set_group_by(['member_name'])),
+            hash(Query(filter='shares', group_by=['member_name']))
+        )
+
+    def test_totals_keep_filter_only(self):
+        query = Query(filter='shares', group_by=['session'], order_by='amount', limit=5)
+        self.assertEqual(query.get_totals(), Query(filter='shares', group_by=['type_code']))
+
+    def test_can_use_rollups(self):
+        self.assertTrue(Query(group_by=['member_name', 'type_code']).can_use_rollups(ROLLUP_KEYS))
+        self.assertFalse(Query(group_by=['title']).can_use_rollups(ROLLUP_KEYS))
+        self.assertFalse(Query().can_use_rollups(ROLLUP_KEYS))
+        self.assertFalse(Query(filter='shares', group_by=['session']).can_use_rollups(ROLLUP_KEYS))
+
+    def test_date_range(self):
+        query = Query().set_date_range('2015-01-01')
+        self.assertEqual(query, Query(date_from=datetime.date(2015, 1, 1)))
+        self.assertFalse(query.can_use_rollups(ROLLUP_KEYS))
+        self.assertTrue(query.set_group_by(['member_name']).reads_only(InterestsStore.totals_columns))
+
+    def test_reads_only(self):
+        totals_columns = InterestsStore.totals_columns
+        self.assertTrue(Query(group_by=['member_name']).reads_only(totals_columns))
+        self.assertTrue(Query(columns=['amount']).reads_only(totals_columns))
+        self.assertFalse(Query().reads_only(totals_columns))
+        self.assertFalse(Query(filter='shares', group_by=['member_name']).reads_only(totals_columns))
+        self.assertFalse(Query(group_by=['title']).reads_only(totals_columns))
+
+    def test_dedupe(self):
+        query = Query(filter='shares', group_by=['session']).set_dedupe()
+        self.assertTrue(query.get_totals().dedupe)
+        self.assertFalse(query.set_filter(None).can_use_rollups(ROLLUP_KEYS))
+        self.assertFalse(query.set_filter(None).reads_only(InterestsStore.totals_columns))
+
+
+class TestInterestsQueries(unittest.TestCase):
+
+    MEMBERS = ['abbott, diane', 'adams, nigel']
+
+    # Dates of each member's interests
+    DATES = [['1 May 2015', '3 June 2014'], ['2 May 2015', 'Unknown']]
+
+    def setUp(self):
+        # A store with the session already ingested, so nothing is fetched
+        self.path = tempfile.mkdtemp()
+        store = InterestsStore(self.path)
+        for i, member_name in enumerate(self.MEMBERS):
+            builder = InterestsBuilder(Interests.columns)
+            for type_code in [1, 2]:
+                builder.add_interest(member_name, StubInterest(
+                    'Title', type_code, 100 * (i + 1), self.DATES[i][type_code - 1],
+                    '{} shares'.format(member_name) if type_code == 1 else 'Speech', '2014-15'
+                ))
+            store.write_page('2014-15', member_name, builder.dataframe)
+        store.write_manifest(
+            'session_2014-15',
+            members=[[m, 'http://example.com'] for m in self.MEMBERS],
+            parser_fingerprint=get_parser_fingerprint(),
+            amount_fingerprint=get_amount_fingerprint(),
+            errata_fingerprint=get_errata_fingerprint()
+        )
+        self.store = store
+        self.interests = Interests(session='2014-15', store=store)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_total_does_not_change_grouping(self):
+        self.interests.group_by_member()
+        self.assertEqual(self.interests.total, Decimal('600.00'))
+        self.assertEqual(list(self.interests.data.columns), ['member_name', 'amount'])
+
+    def test_member_total_does_not_change_grouping(self):
+        self.interests.group_by_session()
+        self.assertEqual(list(self.interests.member_total['amount']), [200, 400])
+        self.assertEqual(list(self.interests.data['session']), ['2014-15'])
+
+    def test_stream(self):
+        interests = Interests(session='2014-15', store=self.store, ingest=False)
+        interests.set_filter('shares')
+        output = io.StringIO()
+        interests.stream([CSVWriter(output)])
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], ','.join(Interests.columns))
+        self.assertEqual([l.split('"')[1] for l in lines[1:]], self.MEMBERS)
+        self.assertIn(',100.00,', lines[1])
+        # Streaming writes the same rows as the whole output
+        file_name = os.path.join(self.path, 'mps.csv')
+        interests.to_csv(file_name)
+        with open(file_name, encoding='utf-8') as f:
+            self.assertEqual(f.read(), output.getvalue())
+
+    def test_stream_does_not_cache_batch_indexes(self):
+        interests = Interests(session='2014-15', store=self.store, ingest=False)
+        interests.set_filter('shares')
+        with mock.patch.object(Interests, 'min_cached_index_rows', 0), \
+                mock.patch.object(DescriptionIndex, 'load_or_build') as load_or_build:
+            interests.stream([CSVWriter(io.StringIO())])
+        load_or_build.assert_not_called()
+
+    def test_member_name_is_resolved_once(self):
+        self.store.write_manifest('session_2015-16', **dict(
+            self.store.read_manifest('session_2014-15'), members=[['abbott, diane', 'http://example.com']]
+        ))
+        self.store.write_manifest('sessions', sessions=['2014-15', '2015-16'], parser_fingerprint=get_parser_fingerprint())
+        with mock.patch.object(self.store, 'read_members', wraps=self.store.read_members) as read_members:
+            interests = Interests(member_name='ABBOTT, Diane', store=self.store)
+        self.assertEqual(interests.pages, [('2014-15', 'abbott, diane'), ('2015-16', 'abbott, diane')])
+        self.assertEqual(read_members.call_count, 1)
+
+    def test_export(self):
+        interests = Interests(session='2014-15', store=self.store, ingest=False)
+        interests.set_filter('speech')
+        targets = [(f, os.path.join(self.path, 'mps.' + f)) for f in ['csv', 'jsonl', 'feather']]
+        interests.export(targets)
+        with open(targets[0][1], encoding='utf-8') as f:
+            self.assertEqual(len(f.read().splitlines()), 3)
+        with open(targets[1][1], encoding='utf-8') as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+        self.assertEqual(Interests.from_feather(targets[2][1]).total, Decimal('300.00'))
+
+    def test_grouped_query_cant_be_streamed(self):
+        self.interests.group_by_member()
+        with self.assertRaises(ValueError):
+            self.interests.stream([CSVWriter(io.StringIO())])
+
+    def test_filter_group_order_limit(self):
+        self.interests.set_filter('shares')
+        self.interests.group_by_member()
+        self.interests.set_order_by('amount')
+        self.interests.set_limit(1)
+        self.assertEqual(self.interests.data.to_dict('records'), [{'member_name': 'adams, nigel', 'amount': 200.0}])
+        self.assertEqual(self.interests.total, Decimal('300.00'))
+        self.assertEqual(self.interests.total_by_type(2), Decimal('0.00'))
+
+    def test_totals_are_answered_from_rollups(self):
+        self.interests.group_by_member()
+        self.assertEqual(list(self.interests.data['amount']), [200, 400])
+        self.assertEqual(self.interests.total_by_type(1), Decimal('300.00'))
+        self.assertEqual(self.interests.total, Decimal('600.00'))
+        self.assertFalse(self.interests._loaded)
+
+    def test_limit_selects_largest(self):
+        self.interests.set_order_by('amount')
+        self.interests.set_limit(3)
+        self.assertEqual(list(self.interests.data['amount']), [200, 200, 100])
+        self.interests.set_order_by('member_name')
+        self.interests.set_limit(1)
+        self.assertEqual(list(self.interests.data['member_name']), ['adams, nigel'])
+
+    def test_dates_are_typed(self):
+        dates = self.interests.data['date']
+        self.assertEqual(dates.dtype, 'datetime64[s]')
+        self.assertEqual(dates.isna().sum(), 1)
+
+    def test_date_range(self):
+        self.interests.set_date_range('2015-05-01', '2015-05-01')
+        self.assertEqual(list(self.interests.data['member_name']), ['abbott, diane'])
+        self.interests.set_date_range(date_from='2015-01-01')
+        self.assertEqual(self.interests.total, Decimal('300.00'))
+        self.interests.set_date_range(date_to='2015-01-01')
+        self.assertEqual(self.interests.total, Decimal('100.00'))
+        self.interests.set_date_range()
+        self.assertEqual(self.interests.total, Decimal('600.00'))
+
+    def test_resample(self):
+        resampled = self.interests.resample('M')
+        self.assertEqual(list(resampled.columns), ['period', 'amount', 'count'])
+        self.assertEqual([str(p) for p in resampled['period']], ['2014-06', '2015-05'])
+        self.assertEqual(list(resampled['amount']), [100.0, 300.0])
+        self.interests.group_by_member()
+        resampled = self.interests.resample('Q')
+        self.assertEqual(list(resampled.columns), ['period', 'member_name', 'amount', 'count'])
+        self.assertEqual(len(resampled), 3)
+
+    def test_summary(self):
+        summary = self.interests.summary()
+        self.assertEqual(list(summary.columns), [
+            'type_code', 'session', 'count', 'no_amount', 'sum', 'mean', 'max', 'p25', 'p50', 'p75', 'p90'])
+        self.assertEqual(summary.iloc[0].to_dict(), {
+            'type_code': 1, 'session': '2014-15', 'count': 2, 'no_amount': 0, 'sum': 300.0, 'mean': 150.0,
+            'max': 200.0, 'p25': 125.0, 'p50': 150.0, 'p75': 175.0, 'p90': 190.0
+        })
+        self.assertEqual(len(self.interests.summary(by_member=True)), 4)
+        self.interests.set_filter('shares')
+        self.assertEqual(list(self.interests.summary()['type_code']), [1])
+
+    def test_summary_leaves_out_missing_amounts(self):
+        builder = InterestsBuilder(Interests.columns)
+        for amount in [None, 300, None]:
+            builder.add_interest('adams, nigel', StubInterest('Title', 1, amount, '2 May 2015', 'Shares', '2014-15'))
+        self.store.write_page('2014-15', 'adams, nigel', builder.dataframe)
+        summary = Interests(session='2014-15', store=self.store).summary()
+        self.assertEqual(summary.iloc[0].to_dict(), {
+            'type_code': 1, 'session': '2014-15', 'count': 2, 'no_amount': 2, 'sum': 400.0, 'mean': 200.0,
+            'max': 300.0, 'p25': 150.0, 'p50': 200.0, 'p75': 250.0, 'p90': 280.0
+        })
+
+    def test_dedupe(self):
+        # Repeat Diane Abbott's shares, differing only in case and spacing
+        builder = InterestsBuilder(Interests.columns)
+        for type_code, description in [(1, 'abbott, diane shares'), (2, 'Speech'), (1, ' Abbott, Diane  SHARES')]:
+            builder.add_interest(self.MEMBERS[0], StubInterest(
+                'Title', type_code, 100, self.DATES[0][type_code - 1], description, '2014-15'))
+        self.store.write_page('2014-15', self.MEMBERS[0], builder.dataframe)
+        interests = Interests(session='2014-15', store=self.store)
+        self.assertEqual(interests.total, Decimal('700.00'))
+        interests.set_dedupe()
+        self.assertEqual(interests.total, Decimal('600.00'))
+        self.assertEqual(list(interests.data['description']), [
+            'abbott, diane shares', 'Speech', 'adams, nigel shares', 'Speech'])
+        self.assertEqual(list(interests.repeats['description']), [' Abbott, Diane  SHARES'])
+        interests.set_filter('speech')
+        self.assertEqual(len(interests.repeats), 0)
+
+    def test_filter_and_date_range(self):
+        self.interests.set_filter('shares')
+        self.interests.set_date_range(date_to='2015-05-01')
+        self.assertEqual(list(self.interests.data['member_name']), ['abbott, diane'])
+
+    def test_results_are_memoised(self):
+        self.assertIs(self.interests._execute(self.interests.query), self.interests._execute(Query()))
+
+
+if __name__ == '__main__':
+    unittest.main()
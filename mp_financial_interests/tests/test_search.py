@@ -0,0 +1,65 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from mp_financial_interests.search import DescriptionIndex
+
+
+class TestDescriptionIndex(unittest.TestCase):
+
+    descriptions = pd.Series([
+        'Payment of £5,000 from Shareholders Ltd for a speech.',
+        'Shares in Acme Limited, a consultancy.',
+        'Hospitality tickets to Wimbledon. (Registered 5 July 2014)',
+        'Payment from News UK, 1 London Bridge Street, London SE1 9GF.',
+        'Director of Cornwall shares.',
+        'Café visit',
+    ])
+
+    terms = [
+        'shares', 'SHARE', 'hare', 'payment from', 'ment fro', '£5,000', '5,000 from',
+        'london', 'london se1', 'shares.', ' shares', 'caf', 'café', 'news uk, 1',
+        'missing', 'Ltd for', 'tickets to wimbledon',
+    ]
+
+    def setUp(self):
+        self.index = DescriptionIndex.build(self.descriptions)
+
+    def _contains(self, term):
+        return self.descriptions.str.contains(term, flags=re.IGNORECASE).to_numpy(dtype=bool)
+
+    def test_search_matches_regex_scan(self):
+        for term in self.terms:
+            np.testing.assert_array_equal(
+                self.index.search(self.descriptions, term), self._contains(term), err_msg=term)
+
+    def test_candidates_narrow_rows(self):
+        self.assertEqual(list(self.index.get_candidates('acme')), [1])
+        self.assertEqual(list(self.index.get_candidates('missing')), [])
+
+    def test_regex_falls_back_to_scan(self):
+        self.assertIsNone(self.index.get_candidates('shar(?:es|eholders)'))
+        np.testing.assert_array_equal(
+            self.index.search(self.descriptions, 'shar(?:es|eholders)'), self._contains('shar(?:es|eholders)'))
+
+    def test_load_or_build(self):
+        index_dir = tempfile.mkdtemp()
+        try:
+            index = DescriptionIndex.load_or_build(self.descriptions, index_dir)
+            self.assertEqual(len(os.listdir(index_dir)), 1)
+            loaded = DescriptionIndex.load_or_build(self.descriptions, index_dir)
+            self.assertEqual(loaded.vocabulary, index.vocabulary)
+            self.assertEqual(len(loaded), len(self.descriptions))
+            np.testing.assert_array_equal(
+                loaded.search(self.descriptions, 'shares'), index.search(self.descriptions, 'shares'))
+        finally:
+            shutil.rmtree(index_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mp_financial_interests.interests import Interests
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.sqlite_store import SQLiteStore
+from mp_financial_interests.tests.test_store import StubInterest
+
+
+class TestSQLiteStore(unittest.TestCase):
+
+    PAGES = [
+        ('2014-15', 'abbott, diane'),
+        ('2014-15', 'adams, nigel'),
+        ('2015-16', 'abbott, diane'),
+    ]
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = SQLiteStore(os.path.join(self.path, 'interests.sqlite'))
+        for session, member_name in self.PAGES:
+            self._write_page(session, member_name, [1, 2])
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _write_page(self, session, member_name, type_codes):
+        builder = InterestsBuilder(Interests.columns)
+        for type_code in type_codes:
+            builder.add_interest(member_name, StubInterest(
+                'Title', type_code, 100, '1 May 2015', 'Shares in {}'.format(member_name), session
+            ))
+        self.store.write_page(session, member_name, builder.dataframe, errata=['a'])
+
+    def test_read_all(self):
+        dataframe = self.store.read()
+        self.assertEqual(len(dataframe), 6)
+        self.assertEqual(list(dataframe.columns), Interests.columns)
+        self.assertEqual(dataframe['member_name'].dtype, 'category')
+        self.assertEqual(dataframe['date'].dtype, 'datetime64[s]')
+        self.assertEqual(dataframe['amount'].sum(), 60000)
+
+    def test_read_pages(self):
+        dataframe = self.store.read(pages=self.PAGES[:1])
+        self.assertEqual(set(dataframe['session']), {'2014-15'})
+        self.assertEqual(set(dataframe['member_name']), {'abbott, diane'})
+        self.assertEqual(len(self.store.read(pages=[])), 0)
+
+    def test_read_filters(self):
+        dataframe = self.store.read(sessions=['2014-15'], member_names=['abbott, diane'], type_codes=[2])
+        self.assertEqual(len(dataframe), 1)
+        self.assertEqual(dataframe['type_code'].iloc[0], 2)
+
+    def test_writing_page_replaces_interests(self):
+        self._write_page('2014-15', 'adams, nigel', [3])
+        dataframe = self.store.read(pages=[('2014-15', 'adams, nigel')])
+        self.assertEqual(list(dataframe['type_code']), [3])
+        self.assertEqual(self.store.sessions, ['2014-15', '2015-16'])
+
+    def test_parent_lengths_are_read_on_request(self):
+        builder = InterestsBuilder(Interests.columns)
+        builder.add_interest('adams, nigel', StubInterest('Title', 1, 100, '1 May 2015', 'Parent: child', '2014-15'))
+        self.store.write_page('2014-15', 'adams, nigel', builder.dataframe.assign(parent_length=8))
+        self.assertNotIn('parent_length', self.store.read().columns)
+        dataframe = self.store.read(pages=[('2014-15', 'adams, nigel')], columns=['parent_length'])
+        self.assertEqual(list(dataframe['parent_length']), [8])
+
+    def test_rollups_are_maintained(self):
+        self._write_page('2014-15', 'adams, nigel', [3, 3])
+        rollups = self.store.read_rollups(sessions=['2014-15'])
+        self.assertEqual(list(rollups.columns), SQLiteStore.rollup_columns)
+        self.assertEqual(list(rollups['member_name']), ['abbott, diane', 'abbott, diane', 'adams, nigel'])
+        self.assertEqual(list(rollups['count']), [1, 1, 2])
+        self.assertEqual(rollups['amount'].sum(), 40000)
+
+    def test_upsert(self):
+        revision = self.store.revision
+        self.assertEqual(revision, 3)
+        _, ids = self._read_keys()
+        self._write_page('2014-15', 'adams, nigel', [1, 2])
+        self.assertEqual(self.store.revision, revision)
+        self.assertEqual(self._read_keys(), ([revision - 1] * 2, ids))
+        # Only the added interest has the new revision
+        self._write_page('2014-15', 'adams, nigel', [1, 2, 3])
+        revisions, added_ids = self._read_keys()
+        self.assertEqual(revisions, [revision - 1] * 2 + [revision + 1])
+        self.assertEqual(added_ids[:2], ids)
+        changed, removed = self.store.read_changes(since=revision)
+        self.assertEqual(list(changed['id']), added_ids[2:])
+        self.assertEqual(list(changed.columns), SQLiteStore.columns + ['id', 'revision'])
+        self.assertEqual(len(removed), 0)
+        self._write_page('2014-15', 'adams, nigel', [1])
+        changed, removed = self.store.read_changes(since=revision + 1)
+        self.assertEqual(len(changed), 0)
+        self.assertEqual(sorted(removed['id']), sorted(added_ids[1:]))
+        self.assertEqual(list(removed['revision']), [revision + 2] * 2)
+        # Re-added interests are no longer removed
+        self._write_page('2014-15', 'adams, nigel', [1, 2])
+        changed, removed = self.store.read_changes(since=revision + 1)
+        self.assertEqual(list(changed['id']), ids[1:])
+        self.assertEqual(list(removed['id']), added_ids[2:])
+
+    def _read_keys(self):
+        dataframe = self.store.read(pages=[('2014-15', 'adams, nigel')], columns=['id', 'revision'])
+        return list(dataframe['revision']), list(dataframe['id'])
+
+    def test_members(self):
+        dataframe = self.store.read(columns=['member_name', 'member_id'])
+        self.assertEqual(dict(dataframe.drop_duplicates().itertuples(index=False)), {'abbott, diane': 1, 'adams, nigel': 2})
+        self.assertEqual(self.store.update_members([('baker, norman', ['BAKER, Norman']), ('adams, nigel', [])]), [3, 2])
+        self._write_page('2015-16', 'baker, norman', [1])
+        self.assertEqual(set(self.store.read(member_names=['baker, norman'])['member_id']), {3})
+        members = self.store.read_members()
+        self.assertEqual(len(members), 3)
+        self.assertEqual(members.resolve('Norman Baker'), 'baker, norman')
+
+    def test_page_metadata(self):
+        metadata = self.store.read_page_metadata('2014-15', 'abbott, diane')
+        self.assertEqual(metadata['errata'], ['a'])
+        with self.assertRaises(KeyError):
+            self.store.read_page_metadata('2010-12', 'abbott, diane')
+
+    def test_manifest(self):
+        self.store.write_manifest('sessions', sessions=['2014-15'], parser_fingerprint='a')
+        self.assertEqual(self.store.read_manifest('sessions')['sessions'], ['2014-15'])
+        self.assertEqual([k for k, _ in self.store.entries()][:2], ['sessions', 'session=2014-15/abbott_diane'])
+        self.store.remove_manifest('sessions')
+        with self.assertRaises(KeyError):
+            self.store.read_manifest('sessions')
+
+    def test_query(self):
+        dataframe = self.store.query(
+            'SELECT member_name, SUM(amount) AS amount FROM interests '
+            'WHERE session = ? GROUP BY member_name ORDER BY member_name', ('2014-15',))
+        self.assertEqual(list(dataframe['member_name']), ['abbott, diane', 'adams, nigel'])
+        self.assertEqual(list(dataframe['amount']), [20000, 20000])
+
+    def test_full_text_search(self):
+        self._write_page('2014-15', 'adams, nigel', [3])
+        self.store.compact()
+        dataframe = self.store.query(
+            'SELECT member_name FROM interests WHERE id IN '
+            '(SELECT rowid FROM interests_fts WHERE interests_fts MATCH ?)', ('nigel',))
+        self.assertEqual(list(dataframe['member_name']), ['adams, nigel'])
+
+    def test_filters_use_indexes(self):
+        for column in SQLiteStore.indexed_columns:
+            plan = self.store.query(
+                'EXPLAIN QUERY PLAN SELECT * FROM interests WHERE {} = 1'.format(column))
+            self.assertIn('interests_{}'.format(column), ' '.join(plan['detail']))
+
+    def test_query_is_read_only(self):
+        with self.assertRaises(Exception):
+            self.store.query('DELETE FROM interests')
+        self.assertEqual(len(self.store.read()), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
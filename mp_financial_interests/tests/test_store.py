@@ -0,0 +1,219 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+from multiprocessing import Pool
+
+from mp_financial_interests.interests import Interests
+from mp_financial_interests.interests_builder import InterestsBuilder
+from mp_financial_interests.store import InterestsStore
+
+
+StubInterest = namedtuple('StubInterest', [
+    'title', 'type_code', 'amount', 'date', 'description', 'session'
+])
+
+
+def _write_page(store, session, member_name, number_of_interests=2):
+    builder = InterestsBuilder(Interests.columns)
+    for type_code in range(1, number_of_interests + 1):
+        builder.add_interest(member_name, StubInterest(
+            'Title', type_code, 100, '1 May 2015', 'Description', session
+        ))
+    store.write_page(session, member_name, builder.dataframe, errata=['a'])
+
+
+def _ingest_and_read(args):
+    # Write pages, compact and read the session as an ingest would - every
+    # read must see whole pages
+    path, worker = args
+    store = InterestsStore(path)
+    row_counts = []
+    for i in range(10):
+        _write_page(store, '2014-15', 'member{}, worker{}'.format(chr(97 + i), chr(97 + worker)))
+        store.compact()
+        store.write_manifest('session_2014-15', members=i, parser_fingerprint='a')
+        row_counts.append(len(store.read(sessions=['2014-15'])))
+        store.read_manifest('session_2014-15')
+    return row_counts
+
+
+class TestInterestsStore(unittest.TestCase):
+
+    PAGES = [
+        ('2014-15', 'abbott, diane'),
+        ('2014-15', 'adams, nigel'),
+        ('2015-16', 'abbott, diane'),
+    ]
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = InterestsStore(self.path)
+        for session, member_name in self.PAGES:
+            _write_page(self.store, session, member_name)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_read_all(self):
+        dataframe = self.store.read()
+        self.assertEqual(len(dataframe), 6)
+        self.assertEqual(list(dataframe.columns), Interests.columns)
+        self.assertEqual(dataframe['member_name'].dtype, 'category')
+        self.assertEqual(dataframe['date'].dtype, 'datetime64[s]')
+        self.assertEqual(dataframe['amount'].sum(), 60000)
+
+    def test_read_pages(self):
+        dataframe = self.store.read(pages=self.PAGES[:1])
+        self.assertEqual(set(dataframe['session']), {'2014-15'})
+        self.assertEqual(set(dataframe['member_name']), {'abbott, diane'})
+
+    def test_read_filters(self):
+        dataframe = self.store.read(sessions=['2014-15'], member_names=['abbott, diane'], type_codes=[2])
+        self.assertEqual(len(dataframe), 1)
+        self.assertEqual(dataframe['type_code'].iloc[0], 2)
+
+    def test_read_totals_projects_columns(self):
+        dataframe = self.store.read_totals()
+        self.assertNotIn('description', dataframe.columns)
+        self.assertEqual(dataframe['amount'].sum(), 60000)
+
+    def test_parent_lengths_are_read_on_request(self):
+        builder = InterestsBuilder(Interests.columns)
+        builder.add_interest('adams, nigel', StubInterest('Title', 1, 100, '1 May 2015', 'Parent: child', '2014-15'))
+        self.store.write_page('2014-15', 'adams, nigel', builder.dataframe.assign(parent_length=8))
+        self.assertNotIn('parent_length', self.store.read().columns)
+        dataframe = self.store.read(pages=[('2014-15', 'adams, nigel')], columns=['parent_length'])
+        self.assertEqual(list(dataframe['parent_length']), [8])
+
+    def test_read_compacted(self):
+        self.store.compact()
+        self.assertEqual(len(self.store.read()), 6)
+        dataframe = self.store.read(pages=self.PAGES[1:2], type_codes=[1])
+        self.assertEqual(len(dataframe), 1)
+        self.assertEqual(list(dataframe['member_name']), ['adams, nigel'])
+
+    def test_read_keeps_session_order(self):
+        self.store.compact()
+        os.remove(self.store._get_compacted_path('2014-15'))
+        dataframe = self.store.read()
+        self.assertEqual(list(dataframe['session'].unique()), ['2014-15', '2015-16'])
+
+    def test_writing_page_replaces_compacted_session(self):
+        self.store.compact()
+        builder = InterestsBuilder(Interests.columns)
+        self.store.write_page('2014-15', 'adams, nigel', builder.dataframe)
+        self.assertEqual(len(self.store.read(sessions=['2014-15'])), 2)
+        self.store.compact()
+        self.assertEqual(len(self.store.read(sessions=['2014-15'])), 2)
+
+    def test_rewriting_unchanged_page_keeps_compacted_session(self):
+        self.store.compact()
+        _write_page(self.store, '2014-15', 'adams, nigel')
+        self.assertTrue(self.store._is_compacted('2014-15'))
+        self.assertEqual(len(self.store.read(sessions=['2014-15'])), 4)
+
+    def test_read_rollups(self):
+        for compact in [False, True]:
+            if compact:
+                self.store.compact()
+            rollups = self.store.read_rollups(pages=self.PAGES[:2])
+            self.assertEqual(list(rollups.columns), InterestsStore.rollup_columns)
+            self.assertEqual(len(rollups), 4)
+            self.assertEqual(set(rollups['session']), {'2014-15'})
+            self.assertEqual(rollups['amount'].sum(), 40000)
+            self.assertEqual(rollups['count'].sum(), 4)
+
+    def test_writing_page_replaces_rollups(self):
+        self.store.compact()
+        _write_page(self.store, '2014-15', 'adams, nigel', 1)
+        rollups = self.store.read_rollups(member_names=['adams, nigel'])
+        self.assertEqual(list(rollups['count']), [1])
+        self.store.compact()
+        self.assertEqual(len(self.store.read_rollups()), 5)
+
+    def test_read_empty(self):
+        dataframe = self.store.read(sessions=['2010-12'])
+        self.assertEqual(len(dataframe), 0)
+        self.assertEqual(list(dataframe.columns), Interests.columns)
+
+    def test_upsert(self):
+        revision = self.store.revision
+        self.assertEqual(revision, 3)
+        _, ids = self._read_keys()
+        _write_page(self.store, '2014-15', 'adams, nigel', 2)
+        self.assertEqual(self.store.revision, revision)
+        self.assertEqual(self._read_keys(), ([revision - 1] * 2, ids))
+        # Only the added interest has the new revision
+        _write_page(self.store, '2014-15', 'adams, nigel', 3)
+        revisions, added_ids = self._read_keys()
+        self.assertEqual(revisions, [revision - 1] * 2 + [revision + 1])
+        self.assertEqual(added_ids[:2], ids)
+        changed, removed = self.store.read_changes(since=revision)
+        self.assertEqual(list(changed['id']), added_ids[2:])
+        self.assertEqual(list(changed.columns), InterestsStore.columns + ['id', 'revision'])
+        self.assertEqual(len(removed), 0)
+        _write_page(self.store, '2014-15', 'adams, nigel', 1)
+        changed, removed = self.store.read_changes(since=revision + 1)
+        self.assertEqual(len(changed), 0)
+        self.assertEqual(sorted(removed['id']), sorted(added_ids[1:]))
+        self.assertEqual(list(removed['revision']), [revision + 2] * 2)
+        # Re-added interests are no longer removed
+        _write_page(self.store, '2014-15', 'adams, nigel', 2)
+        changed, removed = self.store.read_changes(since=revision + 1)
+        self.assertEqual(list(changed['id']), ids[1:])
+        self.assertEqual(list(removed['id']), added_ids[2:])
+
+    def _read_keys(self):
+        dataframe = self.store.read(pages=[('2014-15', 'adams, nigel')], columns=['id', 'revision'])
+        return list(dataframe['revision']), list(dataframe['id'])
+
+    def test_members(self):
+        dataframe = self.store.read(columns=['member_name', 'member_id'])
+        self.assertEqual(dict(dataframe.drop_duplicates().itertuples(index=False)), {'abbott, diane': 1, 'adams, nigel': 2})
+        self.assertEqual(self.store.update_members([('baker, norman', ['BAKER, Norman']), ('adams, nigel', [])]), [3, 2])
+        _write_page(self.store, '2015-16', 'baker, norman')
+        self.assertEqual(set(self.store.read(member_names=['baker, norman'])['member_id']), {3})
+        members = self.store.read_members()
+        self.assertEqual(len(members), 3)
+        self.assertEqual(members.resolve('Norman Baker'), 'baker, norman')
+
+    def test_page_metadata(self):
+        metadata = self.store.read_page_metadata('2014-15', 'abbott, diane')
+        self.assertEqual(metadata['errata'], ['a'])
+        self.assertEqual(metadata['member_name'], 'abbott, diane')
+        with self.assertRaises(KeyError):
+            self.store.read_page_metadata('2010-12', 'abbott, diane')
+
+    def test_manifest(self):
+        self.store.write_manifest('sessions', sessions=['2014-15'], parser_fingerprint='a')
+        manifest = self.store.read_manifest('sessions')
+        self.assertEqual(manifest['sessions'], ['2014-15'])
+        self.store.remove_manifest('sessions')
+        with self.assertRaises(KeyError):
+            self.store.read_manifest('sessions')
+
+
+class TestInterestsStoreConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = InterestsStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_concurrent_ingests(self):
+        with Pool(8) as pool:
+            results = pool.map(_ingest_and_read, [(self.path, w) for w in range(8)])
+        for row_counts in results:
+            self.assertTrue(all(count % 2 == 0 for count in row_counts))
+        # The compacted session matches its pages, whichever process compacted last
+        self.store.compact()
+        self.assertEqual(len(self.store.read(sessions=['2014-15'])), 8 * 10 * 2)
+        self.assertEqual(len(self.store.read(pages=[('2014-15', 'membera, workera')])), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,7 +12,7 @@ setup(
     author_email='ben@benscott.co.uk',
     url='https://github.com/benscott/mp-financial-interests',
     license='GNU GPL 3',
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks', 'benchmarks.*']),
     include_package_data=True,
     zip_safe=False,
     install_requires=[
@@ -21,9 +21,8 @@ setup(
         'click-log',
         'html5lib',
         'pandas',
+        'pyarrow',
         'requests',
-        'requests-cache',
-        'tables'
     ],
     entry_points="""""",
 )